@@ -1,7 +1,10 @@
+from micropython import const
 from mpu6886 import MPU6886
-from neopixel import NeoPixel
-from machine import Pin, I2C
+from m5stickc.sampling import Sampler, ACCEL, GYRO
+from neomatrix import NeoMatrix, rgb565
+import i2c_bus
 from time import sleep
+from scheduler import Scheduler
 from math import *
 
 # Definitions for the ATOM Matrix
@@ -21,10 +24,15 @@ is_atom = True
 #is_atom = False
 
 threshold = const(5)
-color = (0, 0, 20) # Initial color: Blue
+brightness = const(20)
+color = rgb565(0, 0, 255) # Initial color: Blue
 x = int(matrix_size_x / 2) # Get matrix
 y = int(matrix_size_y / 2) # center
-np = NeoPixel(Pin(LED_GPIO), matrix_size_x * matrix_size_y)
+
+# hardware is set up in run(), importing this module has no side effects
+matrix = None
+imu = None
+sampler = None
 
 avg_gx,avg_gy,avg_gz = 0,0,0
 
@@ -60,9 +68,6 @@ def updateDot(p, acel, size, threshold, color1, color2):
             color = color2    # change color if reached the border
     return p
 
-# I2C bus init for ATOM Matrix MPU6886
-i2c = I2C(scl=Pin(MPU6886_SCL), sda=Pin(MPU6886_SDA))
-
 # Values you can use to initialize the accelerometer. AFS_16G, means +-8G sensitivity, and so on
 # Larger scale means less precision
 AFS_2G      = const(0x00)
@@ -77,31 +82,47 @@ GFS_500DPS  = const(0x01)
 GFS_1000DPS = const(0x02)
 GFS_2000DPS = const(0x03)  
 
-# by default, if you initialize MPU6886 with  imu = MPU6886(i2c), GFS_2000DPS and AFS_8G are used
-# if you want to initialize with other values you have too use :
-# imu = MPU6886(i2c,mpu6886.GFS_250DPS,mpu6886.AFS_4G )
-# imu = MPU6886(i2c) #=> use default 8G / 2000DPS
-imu = MPU6886(i2c, GFS_500DPS, AFS_4G)
-
-# in order to calibrate Gyroscope you have to put the device on a flat surface
-# preferably level with the floor and not touch it during the procedure. (1s for 20 cycles)
-calibrateGyro(20)
-
-while True:
-    ax,ay,az = imu.getAccelData()
-    gx,gy,gz = imu.getGyroData()
+def update():
+    global x, y
+    # accel and gyro from one burst read
+    ax,ay,az,gx,gy,gz = sampler.sample()
     pitch, roll, yaw = computeAngles(ax,ay,az)
 #    print(ax,ay,az)
 #   Use correction for gyroscope by subtracting average data from calibration
 #    print(gx-avg_gx,gy-avg_gy,gz-avg_gz)
 #    print(pitch, roll, yaw)
-    np[ y * matrix_size_x + x ] = (0,0,0) # Turn LED off
+    matrix.pixel(x, y, 0) # Turn LED off
     if is_atom:
-        x = updateDot(x, pitch, matrix_size_x, threshold, (20, 0, 0), (20, 20, 0))
-        y = updateDot(y, roll, matrix_size_y, threshold, (20, 0, 20), (0, 20, 20))
+        x = updateDot(x, pitch, matrix_size_x, threshold, rgb565(255, 0, 0), rgb565(255, 255, 0))
+        y = updateDot(y, roll, matrix_size_y, threshold, rgb565(255, 0, 255), rgb565(0, 255, 255))
     else:
-        x = updateDot(x, -roll, matrix_size_x, threshold, (20, 0, 0), (20, 20, 0))
-        y = updateDot(y, pitch, matrix_size_y, threshold, (20, 0, 20), (0, 20, 20))
-    np[ y * matrix_size_x + x ] = color # Turn LED on
-    np.write()
-    sleep(0.1)
\ No newline at end of file
+        x = updateDot(x, -roll, matrix_size_x, threshold, rgb565(255, 0, 0), rgb565(255, 255, 0))
+        y = updateDot(y, pitch, matrix_size_y, threshold, rgb565(255, 0, 255), rgb565(0, 255, 255))
+    matrix.pixel(x, y, color) # Turn LED on
+    matrix.show()
+
+def run():
+    global matrix, imu, sampler
+    matrix = NeoMatrix(LED_GPIO, matrix_size_x, matrix_size_y, brightness)
+
+    # I2C bus init for ATOM Matrix MPU6886
+    i2c = i2c_bus.get(0, sda=MPU6886_SDA, scl=MPU6886_SCL)
+
+    # by default, if you initialize MPU6886 with  imu = MPU6886(i2c), GFS_2000DPS and AFS_8G are used
+    # if you want to initialize with other values you have too use :
+    # imu = MPU6886(i2c,mpu6886.GFS_250DPS,mpu6886.AFS_4G )
+    # imu = MPU6886(i2c) #=> use default 8G / 2000DPS
+    imu = MPU6886(i2c, GFS_500DPS, AFS_4G)
+
+    # in order to calibrate Gyroscope you have to put the device on a flat surface
+    # preferably level with the floor and not touch it during the procedure. (1s for 20 cycles)
+    calibrateGyro(20)
+    sampler = Sampler(imu=imu, channels=ACCEL + GYRO)
+
+    # Refresh the matrix every 100ms, independent of the time spent in update()
+    sched = Scheduler()
+    sched.add(update, 100)
+    sched.run()
+
+if __name__ == "__main__":
+    run()
\ No newline at end of file
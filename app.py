@@ -5,39 +5,42 @@ app.py
 import sys
 import time
 
+import m5stickc
+from m5stickc import sampling
+
+LABELS = (
+    ("Battery Voltage", "battery_voltage"),
+    ("Battery Current", "battery_current"),
+    ("Bus Voltage", "bus_voltage"),
+    ("Bus Current", "bus_current"),
+    ("Input Voltage", "input_voltage"),
+    ("Input Current", "input_current"),
+    ("Temperature", "temperature"),
+    ("Batt power", "battery_power"),
+    ("Batt charge current", "battery_charge_current"),
+    ("APS Voltage", "aps_voltage"),
+    ("warning_level", "warning_level"),
+)
 
-def run():
-    # workaround micropython module cache
-    try:
-        del sys.modules["m5stickc"]
-    except:
-        pass
 
+def run():
     try:
-        from m5stickc import lcd_backlight_power, power_button, axp
+        m5stickc.init()
+        sampler = m5stickc.sampler(sampling.POWER + ("input_voltage", "input_current", "battery_power"))
 
-        lcd_backlight_power(True)
+        m5stickc.lcd_backlight_power(True)
         time.sleep(1)
-        lcd_backlight_power(False)
-        print("Battery Voltage: {}".format(axp.battery_voltage()))
-        print("Battery Current: {}".format(axp.battery_current()))
-        print("Bus Voltage: {}".format(axp.bus_voltage()))
-        print("Bus Current: {}".format(axp.bus_current()))
-        print("Input Voltage: {}".format(axp.input_voltage()))
-        print("Input Current: {}".format(axp.input_current()))
-        print("Temperature: {}".format(axp.temperature()))
-        print("Batt power: {}".format(axp.battery_power()))
-        print("Batt charge current: {}".format(axp.battery_charge_current()))
-        print("APS Voltage: {}".format(axp.aps_voltage()))
-        print("warning_level: {}".format(axp.warning_level()))
+        m5stickc.lcd_backlight_power(False)
+        # all values from one sample, read in 4 I2C transactions
+        sampler.sample()
+        for label, name in LABELS:
+            print("{}: {}".format(label, sampler[name]))
 
     #    while True:
-    #        print("power button: {}".format(power_button()))
+    #        print("power button: {}".format(m5stickc.power_button()))
     #        time.sleep_ms(100)
     except Exception as e:
         sys.print_exception(e)
-        del sys.modules["m5stickc"]
-        del sys.modules[__name__]
 
 
 if __name__ == "__main__":
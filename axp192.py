@@ -49,6 +49,10 @@ class AXP192:
     def __init__(self, i2c_bus):
         self.i2c = i2c_bus
         self.conf = AXP192_Conf()
+        # last values written to the output control registers, so
+        # unchanged settings are not written again
+        self._0x12 = None
+        self._0x28 = None
 
     def _write(self, addr, *values):
         b = bytearray(1)
@@ -95,9 +99,10 @@ class AXP192:
 
         # Set LDO2 & LDO3(TFT_LED & TFT) 3.0V
         self._write(0x28, 0xcc)
+        self._0x28 = 0xcc
 
         # Set ADC sample rate to 200hz
-        self._write(0x84, int("0b11110010"))
+        self._write(0x84, 0b11110010)
 
         # Set ADC to All Enable
         self._write(0x82, 0xff)
@@ -134,10 +139,17 @@ class AXP192:
         self._write(0x32, 0x46)
 
     # Depending on configuration enable LDO2, LDO3, DCDC1, DCDC3.
+    # Only the first call reads the register, later calls write it only
+    # if the outputs change.
     def _set_power_0x12(self):
-        b = (self._read_bits(0x12, 8) & 0xef) | 0x4D
+        if self._0x12 is None:
+            b = (self._read_bits(0x12, 8) & 0xef) | 0x4D
+        else:
+            b = self._0x12
         b = (b & 0xf0) | self.conf.mask_0x12()
-        self._write(0x12, b)
+        if b != self._0x12:
+            self._write(0x12, b)
+            self._0x12 = b
 
     def set_LD02(self, status):
         """Turn LD02 output on or off.
@@ -150,6 +162,30 @@ class AXP192:
         self.conf.LD02 = status
         self._set_power_0x12()
 
+    def set_LD02_level(self, level):
+        """Set LD02 output voltage to 1.8V + level * 0.1V, level 0..15.
+
+        On M5StickC, this sets the LCD backlight brightness. The register
+        is only written if the level changes.
+
+        Arduino call: ScreenBreath()
+        """
+
+        level = max(0, min(15, int(level)))
+        if self._0x28 is None:
+            self._0x28 = self._read_bits(0x28, 8)
+        b = (self._0x28 & 0x0f) | (level << 4)
+        if b != self._0x28:
+            self._write(0x28, b)
+            self._0x28 = b
+
+    def LD02_level(self):
+        """Return the LD02 voltage level set with set_LD02_level()"""
+
+        if self._0x28 is None:
+            self._0x28 = self._read_bits(0x28, 8)
+        return self._0x28 >> 4
+
     def button(self):
         """Return status of the M5StickC power button
 
@@ -160,6 +196,15 @@ class AXP192:
             self._write(0x46, 0x03)
         return st
 
+    def vbus_present(self):
+        """Return True if the device is powered through USB (VBUS).
+
+        Arduino call: GetInputPowerStatus()
+        """
+        if self._read_bits(0x00, 8) & 0x20:
+            return True
+        return False
+
     def battery_voltage(self):
         """Return battery voltage
 
@@ -272,3 +317,4 @@ class AXP192:
         self._write(0x90, 0x00)      # GPIO 0 not longer on LD0
         self._write(0x12, 0x09)
         self._write(0x12, 0x00)      # disable LD02, LD03, DCDC1, DCDC3
+        self._0x12 = None
@@ -0,0 +1,304 @@
+"""
+bench.py
+
+Cost of every public driver call: I2C and SPI transactions and bytes,
+NeoPixel writes, wall time (ticks_us) and heap allocated (gc.mem_alloc
+deltas, with the garbage collector disabled while measuring).
+
+The drivers get counting proxies instead of the bus objects, so the same
+numbers come out on the device and under the host emulator
+(host/bench_host.py). Results are JSON lines, one per call, which can be
+compared between versions with host/bench_host.py diff.
+
+On the device:
+    import bench
+    bench.run()                 # or: bench.run('/bench.jsonl')
+
+axp192.AXP192.set_sleep is skipped on the device, it turns off the
+outputs powering the ESP32 peripherals.
+"""
+
+import gc
+import json
+import sys
+import time
+
+import framebuf
+
+VERSION = 1
+
+# default number of calls per measurement
+REPEAT = 20
+
+# slow calls, measured once
+ONCE = ('init', 'setup', 'init_display', 'set_sleep')
+
+SKIP = ('axp192.AXP192.set_sleep',)
+
+# arguments for methods which need them, values may be functions of the
+# object under test
+ARGS = {
+    'set_LD02': (True,),
+    'set_LD02_level': lambda o: (o.LD02_level(),),
+    'sleepms': (1,),
+    'setReg': (0x19, 0x05),             # MPU6886 SMPLRT_DIV, as in init()
+    'getReg': (0x75,),                  # MPU6886 WHOAMI
+    'getnReg': (0x3b, 14),              # MPU6886 accel, temperature, gyro
+    'setGyroFsr': lambda o: (o.Gscale,),
+    'setAccelFsr': lambda o: (o.Ascale,),
+    'write_cmd': (0x00,),               # ST7735 NOP
+    'write_data': (b'\x00\x00',),
+}
+
+
+class Counter:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.tx = 0
+        self.wr = 0
+        self.rd = 0
+
+    def add(self, wr=0, rd=0):
+        self.tx += 1
+        self.wr += wr
+        self.rd += rd
+
+
+class CountingI2C:
+    """I2C proxy counting transactions and bytes (register address included)"""
+
+    def __init__(self, i2c, counter):
+        self.i2c = i2c
+        self.counter = counter
+
+    def scan(self):
+        self.counter.add()
+        return self.i2c.scan()
+
+    def readfrom(self, addr, nbytes):
+        self.counter.add(0, nbytes)
+        return self.i2c.readfrom(addr, nbytes)
+
+    def readfrom_into(self, addr, buf):
+        self.counter.add(0, len(buf))
+        self.i2c.readfrom_into(addr, buf)
+
+    def writeto(self, addr, buf):
+        self.counter.add(len(buf))
+        return self.i2c.writeto(addr, buf)
+
+    def readfrom_mem(self, addr, reg, nbytes):
+        self.counter.add(1, nbytes)
+        return self.i2c.readfrom_mem(addr, reg, nbytes)
+
+    def readfrom_mem_into(self, addr, reg, buf):
+        self.counter.add(1, len(buf))
+        self.i2c.readfrom_mem_into(addr, reg, buf)
+
+    def writeto_mem(self, addr, reg, buf):
+        self.counter.add(1 + len(buf))
+        self.i2c.writeto_mem(addr, reg, buf)
+
+
+class CountingSPI:
+    """SPI proxy counting transactions and bytes"""
+
+    def __init__(self, spi, counter):
+        self.spi = spi
+        self.counter = counter
+
+    def write(self, buf):
+        self.counter.add(len(buf))
+        self.spi.write(buf)
+
+    def read(self, nbytes, write=0x00):
+        self.counter.add(nbytes, nbytes)
+        return self.spi.read(nbytes, write)
+
+    def readinto(self, buf, write=0x00):
+        self.counter.add(len(buf), len(buf))
+        self.spi.readinto(buf, write)
+
+    def write_readinto(self, write_buf, read_buf):
+        self.counter.add(len(write_buf), len(read_buf))
+        self.spi.write_readinto(write_buf, read_buf)
+
+
+class CountingNeoPixel:
+    """NeoPixel proxy counting write() calls and bytes sent"""
+
+    def __init__(self, np, counter):
+        self.np = np
+        self.counter = counter
+        self.buf = np.buf
+        self.bpp = np.bpp
+        self.ORDER = np.ORDER
+
+    def write(self):
+        self.counter.add(len(self.buf))
+        self.np.write()
+
+
+class Bench:
+    """Measure calls and write one JSON line per call to out"""
+
+    def __init__(self, out=None, repeat=REPEAT, skip=SKIP):
+        self.out = out or sys.stdout
+        self.repeat = repeat
+        self.skip = skip
+        self.i2c = Counter()
+        self.spi = Counter()
+        self.led = Counter()
+
+    def header(self):
+        info = {'bench': VERSION, 'platform': sys.platform,
+                'implementation': sys.implementation.name,
+                'version': '.'.join(str(v) for v in sys.implementation.version[:3])}
+        try:
+            import machine
+            info['freq'] = machine.freq()
+        except (ImportError, AttributeError):
+            pass
+        self.emit(info)
+
+    def emit(self, d):
+        self.out.write(json.dumps(d))
+        self.out.write('\n')
+
+    def measure(self, name, func, args=(), calls=None):
+        """Call func(*args) calls times and emit the cost per call"""
+        if name in self.skip:
+            return None
+        calls = calls or self.repeat
+        for c in (self.i2c, self.spi, self.led):
+            c.reset()
+        gc.collect()
+        gc.disable()
+        try:
+            alloc = gc.mem_alloc()
+            start = time.ticks_us()
+            for _ in range(calls):
+                func(*args)
+            us = time.ticks_diff(time.ticks_us(), start)
+            alloc = gc.mem_alloc() - alloc
+        finally:
+            gc.enable()
+        result = {
+            'name': name,
+            'calls': calls,
+            'us': round(us / calls, 1),
+            'alloc': round(alloc / calls, 1),
+            'i2c_tx': self.i2c.tx / calls,
+            'i2c_wr': self.i2c.wr / calls,
+            'i2c_rd': self.i2c.rd / calls,
+            'spi_tx': self.spi.tx / calls,
+            'spi_wr': self.spi.wr / calls,
+            'spi_rd': self.spi.rd / calls,
+            'led_tx': self.led.tx / calls,
+            'led_wr': self.led.wr / calls,
+        }
+        self.emit(result)
+        return result
+
+    def methods(self, prefix, obj, base=object):
+        """Measure all public methods of obj that base does not have"""
+        cls = type(obj)
+        exclude = dir(base)
+        for name in sorted(dir(cls)):
+            if name.startswith('_') or name in exclude:
+                continue
+            if not callable(getattr(cls, name)):
+                continue
+            args = ARGS.get(name, ())
+            if callable(args):
+                args = args(obj)
+            self.measure(prefix + name, getattr(obj, name), args,
+                         1 if name in ONCE else None)
+
+    def i2c_bus(self):
+        import i2c_bus
+        return CountingI2C(i2c_bus.get(0), self.i2c)
+
+    def axp192(self):
+        from axp192 import AXP192
+        axp = AXP192(self.i2c_bus())
+        axp.setup()
+        self.methods('axp192.AXP192.', axp)
+
+    def mpu6886(self):
+        from mpu6886 import MPU6886
+        imu = MPU6886(self.i2c_bus())
+        self.methods('mpu6886.MPU6886.', imu)
+
+    def sampler(self):
+        from axp192 import AXP192
+        from mpu6886 import MPU6886
+        from m5stickc import sampling
+        axp = AXP192(self.i2c_bus())
+        imu = MPU6886(self.i2c_bus())
+        for name, channels in (('power', sampling.POWER), ('imu', sampling.IMU),
+                               ('all', sampling.POWER + sampling.IMU)):
+            s = sampling.Sampler(axp, imu, channels)
+            self.measure('m5stickc.sampling.Sampler.sample.' + name, s.sample)
+
+    def m5stickc_lcd(self):
+        import m5stickc
+        lcd = m5stickc.lcd()
+        # enable_lcd_power() goes through the shared AXP192
+        axp = m5stickc.axp()
+        i2c = axp.i2c
+        spi = lcd.spi
+        axp.i2c = CountingI2C(i2c, self.i2c)
+        lcd.spi = CountingSPI(spi, self.spi)
+        try:
+            self.methods('m5stickc_lcd.ST7735.', lcd, framebuf.FrameBuffer)
+            # drawing only touches the frame buffer
+            self.measure('m5stickc_lcd.ST7735.fill', lcd.fill, (0,))
+            self.measure('m5stickc_lcd.ST7735.text', lcd.text, ('bench', 0, 0, 0xffff))
+        finally:
+            axp.i2c = i2c
+            lcd.spi = spi
+
+    def neopixel(self, pin=26, width=18, height=7):
+        """NeoMatrix and the Neoflashhat loop, by default on the NeoFlash hat"""
+        from mpu6886 import MPU6886
+        from neomatrix import NeoMatrix, rgb565
+        import Neoflashhat
+
+        matrix = NeoMatrix(pin, width, height, brightness=20)
+        matrix.np = CountingNeoPixel(matrix.np, self.led)
+        name = 'neomatrix.NeoMatrix.%dx%d.' % (width, height)
+        self.measure(name + 'pixel', matrix.pixel, (1, 1, rgb565(0, 0, 255)))
+        self.measure(name + 'fill', matrix.fill, (rgb565(255, 0, 0),))
+        self.measure(name + 'show', matrix.show)
+        self.measure(name + 'set_brightness', matrix.set_brightness, (20,))
+
+        # one iteration of the NeoFlash/ATOM Matrix main loop
+        from m5stickc.sampling import Sampler, ACCEL, GYRO
+        Neoflashhat.matrix = matrix
+        Neoflashhat.imu = MPU6886(self.i2c_bus())
+        Neoflashhat.sampler = Sampler(imu=Neoflashhat.imu, channels=ACCEL + GYRO)
+        self.measure('Neoflashhat.update.%dx%d' % (width, height), Neoflashhat.update)
+
+    def run(self):
+        self.header()
+        self.axp192()
+        self.mpu6886()
+        self.sampler()
+        self.m5stickc_lcd()
+        self.neopixel()
+
+
+def run(filename=None, repeat=REPEAT, skip=SKIP):
+    """Run all benchmarks, printing JSON lines or writing them to filename"""
+    if filename is None:
+        Bench(None, repeat, skip).run()
+        return
+    with open(filename, 'w') as f:
+        Bench(f, repeat, skip).run()
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,404 @@
+"""
+datalog.py
+
+Binary sensor logger.
+
+Samples from registered sources (AXP192 channels, IMU axes, ...) are
+packed with a time stamp into fixed size binary records in a RAM block.
+Every source writes its fields straight into the block, so adding a
+record allocates nothing. Full blocks are handed over to flush(), which
+writes whole blocks to flash and starts a new file when the size limit
+is reached.
+
+flush() blocks while the block is written (tens of ms for 4 KB), and
+sample() calls due in that time are late. For IMU data at the full
+sample rate use an ImuFifo as bulk source instead: the MPU6886 keeps
+buffering samples in its 1 KB FIFO (73 records, 438 ms at the default
+167 Hz) while flash is written, and drain() reads all of them in one
+I2C transaction and packs them as records. Samples the FIFO lost to an
+overflow are counted in ImuFifo.resets, records that did not fit into
+the blocks in DataLogger.dropped.
+
+File format (little endian):
+    header:
+        b'M5LG' version:u8 ticks_bits:u8 len:u8 format len:u16 names
+    records:
+        struct format '<' + format, first field is ticks_us:u32
+    format is a struct format string (one character per field) and
+    names the comma separated field names.
+
+Use host/datalog_reader.py to decode the files on a PC.
+
+Example:
+    import m5stickc
+    from m5stickc import sampling
+    from datalog import DataLogger, sampler_source
+    log = DataLogger('/power')
+    log.add_source(*sampler_source(m5stickc.sampler(sampling.POWER)))
+    log.start()
+    sched.add(log.sample, 1000, priority=1)
+    sched.add(log.flush, 5000)
+
+IMU at the full sample rate:
+    from datalog import DataLogger, ImuFifo
+    log = DataLogger('/imu')
+    log.add_bulk_source(ImuFifo(m5stickc.imu()))
+    log.start()
+    sched.add(log.drain, 100, priority=1)
+    sched.add(log.flush, 100)
+"""
+
+import os
+import struct
+import time
+
+MAGIC = b'M5LG'
+VERSION = 1
+
+# time.ticks_us() wraps at 2**TICKS_BITS on the ESP32 port
+TICKS_BITS = 30
+
+MPU6886_ADDRESS = 0x68
+MPU6886_SMPLRT_DIV = 0x19
+MPU6886_FIFO_EN = 0x23
+MPU6886_ACCEL_XOUT_H = 0x3B
+MPU6886_USER_CTRL = 0x6A
+MPU6886_FIFO_COUNTH = 0x72
+MPU6886_FIFO_SIZE = 1024
+
+IMU_NAMES = ('ax', 'ay', 'az', 'temp', 'gx', 'gy', 'gz')
+
+
+class DataLogger:
+    """Double buffered binary logger with file rotation.
+
+    prefix:        file name prefix, files are <prefix>0000.bin, ...
+    block_size:    RAM block size, written to flash in one go
+    max_file_size: start a new file when this size would be exceeded
+    max_files:     remove the oldest file when there are more
+    """
+
+    def __init__(self, prefix='log', block_size=4096, max_file_size=256 * 1024, max_files=8):
+        self.prefix = prefix
+        self.block_size = block_size
+        self.max_file_size = max_file_size
+        self.max_files = max_files
+        self.names = []
+        self.format = 'I'
+        self._sources = []
+        self._bulk = None
+        self._file = None
+        self._file_size = 0
+        self._offset = 0
+        self.index = -1
+        self.records = 0
+        self.dropped = 0
+        self.blocks_written = 0
+
+    def add_source(self, names, pack, fmt='f'):
+        """Register a source.
+
+        names: field names
+        pack:  function pack(buf, offset) writing the fields into buf at
+               offset, little endian as given by fmt
+        fmt:   struct format character for all fields, or one per field
+        """
+        if self._file is not None:
+            raise Exception("add sources before start()")
+        if self._bulk is not None:
+            raise ValueError("a logger with a bulk source has no other sources")
+        if len(fmt) == 1:
+            fmt = fmt * len(names)
+        if len(fmt) != len(names):
+            raise ValueError("one format character per field")
+        self._sources.append((pack, struct.calcsize('<' + self.format)))
+        self.names.extend(names)
+        self.format += fmt
+
+    def add_bulk_source(self, source):
+        """Register a source delivering several samples at once, e.g. ImuFifo.
+
+        Its fields (source.names, source.fmt) are the only ones in the
+        records, which are added by drain().
+        """
+        if self._file is not None:
+            raise Exception("add sources before start()")
+        if self._sources or self._bulk is not None:
+            raise ValueError("a bulk source must be the only source")
+        self._bulk = source
+        self.names.extend(source.names)
+        self.format += source.fmt
+
+    def start(self):
+        """Freeze the record format, allocate blocks and open the first file"""
+        self._fmt = '<' + self.format
+        self.record_size = struct.calcsize(self._fmt)
+        self.records_per_block = self.block_size // self.record_size
+        if self.records_per_block == 0:
+            raise ValueError("block_size smaller than a record")
+        size = self.records_per_block * self.record_size
+        self._blocks = [bytearray(size), bytearray(size)]
+        self._active = 0
+        self._pos = 0
+        self._pending = None
+        self.index = self._last_index()
+        self._open_next()
+
+    def _filename(self, index):
+        return '%s%04d.bin' % (self.prefix, index)
+
+    def _split_prefix(self):
+        i = self.prefix.rfind('/')
+        if i < 0:
+            return '.', self.prefix
+        return self.prefix[:i] or '/', self.prefix[i + 1:]
+
+    def _indices(self):
+        directory, base = self._split_prefix()
+        indices = []
+        for name in os.listdir(directory):
+            if name.startswith(base) and name.endswith('.bin'):
+                try:
+                    indices.append(int(name[len(base):-4]))
+                except ValueError:
+                    pass
+        return sorted(indices)
+
+    def _last_index(self):
+        indices = self._indices()
+        return indices[-1] if indices else -1
+
+    def _header(self):
+        fmt = self.format.encode()
+        names = ','.join(self.names).encode()
+        return MAGIC + struct.pack('<BBB', VERSION, TICKS_BITS, len(fmt)) + fmt + \
+            struct.pack('<H', len(names)) + names
+
+    def _open_next(self):
+        if self._file is not None:
+            self._file.close()
+        self.index += 1
+        self._file = open(self._filename(self.index), 'wb')
+        header = self._header()
+        self._file.write(header)
+        self._file_size = len(header)
+
+        indices = self._indices()
+        while len(indices) > self.max_files:
+            os.remove(self._filename(indices.pop(0)))
+
+    def log(self, values):
+        """Add a record with the given values (without time stamp)"""
+        block = self._reserve()
+        if block is not None:
+            struct.pack_into(self._fmt, block, self._offset, time.ticks_us(), *values)
+            self._commit()
+
+    def sample(self):
+        """Read all sources into a new record"""
+        block = self._reserve()
+        if block is None:
+            return
+        offset = self._offset
+        struct.pack_into('<I', block, offset, time.ticks_us())
+        for pack, o in self._sources:
+            pack(block, offset + o)
+        self._commit()
+
+    def drain(self):
+        """Read the bulk source and add a record per sample. Returns the number read"""
+        source = self._bulk
+        n = source.drain()
+        t = source.t0_us
+        period = source.period_us
+        for i in range(n):
+            block = self._reserve()
+            if block is not None:
+                struct.pack_into('<I', block, self._offset, t)
+                source.pack(block, self._offset + 4, i)
+                self._commit()
+            t = time.ticks_add(t, period)
+        return n
+
+    def _reserve(self):
+        # return the block for the next record, at self._offset, or None
+        if self._pos == self.records_per_block:
+            if self._pending is not None:
+                # both blocks are full, flush() does not keep up
+                self.dropped += 1
+                return None
+            self._swap()
+        self._offset = self._pos * self.record_size
+        return self._blocks[self._active]
+
+    def _commit(self):
+        self._pos += 1
+        self.records += 1
+        if self._pos == self.records_per_block and self._pending is None:
+            self._swap()
+
+    def _swap(self):
+        self._pending = self._active
+        self._active ^= 1
+        self._pos = 0
+
+    def flush(self):
+        """Write a full block to flash, if there is one. Returns True if written"""
+        if self._pending is None:
+            if self._pos == self.records_per_block:
+                self._swap()
+            else:
+                return False
+        block = self._blocks[self._pending]
+        if self._file_size + len(block) > self.max_file_size:
+            self._open_next()
+        self._file.write(block)
+        self._file_size += len(block)
+        self._pending = None
+        self.blocks_written += 1
+        return True
+
+    def close(self):
+        """Write all buffered records and close the file"""
+        while self.flush():
+            pass
+        if self._pos:
+            n = self._pos * self.record_size
+            self._file.write(memoryview(self._blocks[self._active])[:n])
+            self._pos = 0
+        self._file.close()
+        self._file = None
+
+
+def axp_source(axp, channels=('battery_voltage', 'battery_current', 'bus_voltage', 'temperature')):
+    """Return (names, pack, fmt) to log AXP192 values, one per method name"""
+    methods = [getattr(axp, name) for name in channels]
+    n = len(methods)
+
+    def pack(buf, offset):
+        for i in range(n):
+            struct.pack_into('<f', buf, offset + 4 * i, methods[i]())
+
+    return tuple(channels), pack, 'f'
+
+
+def _float_bytes(values):
+    # the bytes of an array('f'), to copy it without creating float objects
+    try:
+        import uctypes
+    except ImportError:
+        return memoryview(values).cast('B')
+    return uctypes.bytearray_at(uctypes.addressof(values), 4 * len(values))
+
+
+def sampler_source(sampler, max_age_ms=0):
+    """Return (names, pack, fmt) to log all channels of a m5stickc Sampler.
+
+    Values younger than max_age_ms, e.g. from a sample taken by another
+    consumer, are logged without reading the hardware again. Channels
+    added to the Sampler later on are not logged.
+    """
+    names = sampler.channels
+    nbytes = 4 * len(names)
+    # float32 array, copied as little endian bytes
+    cache = [None, None]
+
+    def pack(buf, offset):
+        values = sampler.latest(max_age_ms)
+        if values is not cache[0]:
+            # add_channels() replaced the array
+            cache[0] = values
+            cache[1] = _float_bytes(values)
+        raw = cache[1]
+        for i in range(nbytes):
+            buf[offset + i] = raw[i]
+
+    return names, pack, 'f'
+
+
+def _swap16(src, start, dst, offset, nbytes):
+    # copy big endian 16 bit values as little endian
+    for i in range(0, nbytes, 2):
+        dst[offset + i] = src[start + i + 1]
+        dst[offset + i + 1] = src[start + i]
+
+
+def imu_source(imu):
+    """Return (names, pack, fmt) to log raw MPU6886 accel, temperature and gyro values"""
+    buf = bytearray(14)
+
+    def pack(block, offset):
+        imu.i2c.readfrom_mem_into(MPU6886_ADDRESS, MPU6886_ACCEL_XOUT_H, buf)
+        _swap16(buf, 0, block, offset, 14)
+
+    return IMU_NAMES, pack, 'hhhhhhh'
+
+
+class ImuFifo:
+    """MPU6886 FIFO as bulk source: raw accel, temperature and gyro values.
+
+    Enables the FIFO for accel and gyro (temperature comes with them).
+    drain() reads FIFO_COUNTH, FIFO_COUNTL and up to burst samples from
+    FIFO_R_W in one burst read. The burst is sized from the previous
+    count, one sample short of it, so it does not read past the data; a
+    sample arriving during a longer read would shift the FIFO by part of
+    a record. A count that is not a whole number of records (overflow or
+    such a shift) resets the FIFO and is counted in resets.
+
+    imu:        MPU6886 instance, already initialised
+    max_burst:  most samples read at once, sets the buffer size
+    """
+
+    RECORD = 14
+    names = IMU_NAMES
+    fmt = 'hhhhhhh'
+
+    def __init__(self, imu, max_burst=MPU6886_FIFO_SIZE // 14):
+        self.i2c = imu.i2c
+        self.max_burst = max_burst
+        self.burst = 1
+        self.resets = 0
+        self.pending = 0            # samples left in the FIFO after drain()
+        self.t0_us = 0              # ticks_us of the first sample of drain()
+        # internal rate is 1 kHz with the DLPF set up by MPU6886.init()
+        self.period_us = 1000 * (1 + imu.getReg(MPU6886_SMPLRT_DIV))
+        self._buf = bytearray(2 + self.RECORD * max_burst)
+        mv = memoryview(self._buf)
+        self._reads = [mv[:2 + self.RECORD * n] for n in range(max_burst + 1)]
+        imu.setReg(MPU6886_FIFO_EN, 0x18)
+        self._user_ctrl = imu.getReg(MPU6886_USER_CTRL) | 0x40
+        self.reset()
+
+    def reset(self):
+        """Empty the FIFO"""
+        self.i2c.writeto_mem(MPU6886_ADDRESS, MPU6886_USER_CTRL, bytes((self._user_ctrl | 0x04,)))
+        self.burst = 1
+        self.pending = 0
+        self._next_us = None
+
+    def drain(self):
+        """Read up to burst samples. Returns the number read"""
+        buf = self._buf
+        t = time.ticks_us()
+        self.i2c.readfrom_mem_into(MPU6886_ADDRESS, MPU6886_FIFO_COUNTH, self._reads[self.burst])
+        count = ((buf[0] << 8) | buf[1]) & 0x1fff
+        if count % self.RECORD:
+            self.resets += 1
+            self.reset()
+            return 0
+        available = count // self.RECORD
+        n = min(self.burst, available)
+        self.pending = available - n
+        self.burst = max(1, min(self.max_burst, available - 1))
+        # the newest sample was taken at most a period before t; time
+        # stamps do not go back behind the samples of the last drain()
+        t0 = time.ticks_add(t, -(available - 1) * self.period_us)
+        if self._next_us is not None and time.ticks_diff(t0, self._next_us) < 0:
+            t0 = self._next_us
+        self.t0_us = t0
+        self._next_us = time.ticks_add(t0, n * self.period_us)
+        return n
+
+    def pack(self, block, offset, i):
+        """Write sample i of the last drain() into block at offset"""
+        _swap16(self._buf, 2 + self.RECORD * i, block, offset, self.RECORD)
@@ -0,0 +1,102 @@
+"""
+bench_host.py
+
+Run bench.py under the M5StickC emulator (m5emu) and compare results.
+
+    python bench_host.py run [-o bench.jsonl]
+    python bench_host.py diff old.jsonl new.jsonl
+
+Results from the device (bench.run('/bench.jsonl'), then copied to the
+PC) can be compared the same way. Bus transaction and byte counts are
+exact and reported on any change; time and allocations are reported
+when they differ by more than --threshold percent. diff exits with
+status 1 if anything got worse, so it can gate CI.
+"""
+
+import argparse
+import json
+import sys
+import tracemalloc
+
+import m5emu
+
+COUNTS = ('i2c_tx', 'i2c_wr', 'i2c_rd', 'spi_tx', 'spi_wr', 'spi_rd', 'led_tx', 'led_wr')
+MEASURED = ('us', 'alloc')
+
+
+def run(out):
+    board = m5emu.install()
+    # slightly tilted, a real IMU never reads exactly 0 on two axes
+    board.imu.accel = (0.02, -0.01, 0.99)
+    import bench
+    tracemalloc.start()
+    try:
+        bench.Bench(out, skip=()).run()
+    finally:
+        tracemalloc.stop()
+
+
+def load(path):
+    """Return {name: result} of a results file, without the header"""
+    results = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            d = json.loads(line)
+            if 'name' in d:
+                results[d['name']] = d
+    return results
+
+
+def diff(old, new, threshold=10.0):
+    """Print the differences, return the number of regressions"""
+    worse = 0
+    for name in sorted(set(old) | set(new)):
+        if name not in new:
+            print('%-45s removed' % name)
+            continue
+        if name not in old:
+            print('%-45s new' % name)
+            continue
+        a, b = old[name], new[name]
+        changes = []
+        for key in COUNTS:
+            if a.get(key) != b.get(key):
+                changes.append('%s %s -> %s' % (key, a.get(key), b.get(key)))
+                worse += b.get(key, 0) > a.get(key, 0)
+        for key in MEASURED:
+            x, y = a.get(key, 0), b.get(key, 0)
+            if abs(y - x) > max(abs(x), 1) * threshold / 100:
+                changes.append('%s %s -> %s' % (key, x, y))
+                worse += y > x
+        if changes:
+            print('%-45s %s' % (name, ', '.join(changes)))
+    return worse
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('run', help='run the benchmarks under the emulator')
+    p.add_argument('-o', '--output', help='results file (default: stdout)')
+    p = sub.add_parser('diff', help='compare two results files')
+    p.add_argument('old')
+    p.add_argument('new')
+    p.add_argument('--threshold', type=float, default=10.0,
+                   help='percent change of time and allocations to report (default 10)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        if args.output:
+            with open(args.output, 'w') as f:
+                run(f)
+        else:
+            run(sys.stdout)
+        return 0
+    return 1 if diff(load(args.old), load(args.new), args.threshold) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+datalog_reader.py
+
+Decode log files written by datalog.py on a PC (CPython + NumPy).
+
+    from datalog_reader import read_log, read_logs
+    data = read_logs('log')        # log0000.bin, log0001.bin, ...
+    data['t_us'], data['ax'], ...
+
+Time stamps are unwrapped (ticks_us wraps at 2**ticks_bits on the
+device) into a monotonic int64 't_us' column, relative to the first
+record.
+
+Command line:
+    python datalog_reader.py log0000.bin [more files]
+"""
+
+import glob
+import struct
+import sys
+
+import numpy as np
+
+MAGIC = b'M5LG'
+
+
+def read_header(f):
+    """Return (format, names, ticks_bits) and leave f at the first record"""
+    if f.read(4) != MAGIC:
+        raise ValueError("not a datalog file")
+    version, ticks_bits, fmt_len = struct.unpack('<BBB', f.read(3))
+    if version != 1:
+        raise ValueError("unsupported version %d" % version)
+    fmt = f.read(fmt_len).decode()
+    names_len, = struct.unpack('<H', f.read(2))
+    names = f.read(names_len).decode().split(',') if names_len else []
+    return fmt, names, ticks_bits
+
+
+def _dtype(fmt, names):
+    fields = [('ticks', '<' + fmt[0])]
+    for name, code in zip(names, fmt[1:]):
+        fields.append((name, '<' + code))
+    return np.dtype(fields)
+
+
+def unwrap_ticks(ticks, ticks_bits):
+    """Turn wrapping tick values into monotonic int64 values from 0"""
+    period = 1 << ticks_bits
+    ticks = ticks.astype(np.int64)
+    if len(ticks) == 0:
+        return ticks
+    steps = np.diff(ticks) % period
+    return np.concatenate(([0], np.cumsum(steps)))
+
+
+def read_raw(path):
+    """Return the records of a single file as structured array, plus ticks_bits"""
+    with open(path, 'rb') as f:
+        fmt, names, ticks_bits = read_header(f)
+        dtype = _dtype(fmt, names)
+        data = f.read()
+    # a partially written last record is ignored
+    n = len(data) // dtype.itemsize
+    return np.frombuffer(data[:n * dtype.itemsize], dtype=dtype), ticks_bits
+
+
+def _with_time(raw, ticks_bits):
+    names = [n for n in raw.dtype.names if n != 'ticks']
+    dtype = [('t_us', np.int64)] + [(n, raw.dtype[n]) for n in names]
+    out = np.empty(len(raw), dtype=dtype)
+    out['t_us'] = unwrap_ticks(raw['ticks'], ticks_bits)
+    for n in names:
+        out[n] = raw[n]
+    return out
+
+
+def read_log(path):
+    """Decode a single log file"""
+    raw, ticks_bits = read_raw(path)
+    return _with_time(raw, ticks_bits)
+
+
+def read_logs(prefix):
+    """Decode and concatenate all rotated files <prefix>NNNN.bin in order"""
+    paths = sorted(glob.glob(prefix + '[0-9][0-9][0-9][0-9].bin'))
+    if not paths:
+        raise FileNotFoundError(prefix)
+    parts = []
+    ticks_bits = None
+    for path in paths:
+        raw, ticks_bits = read_raw(path)
+        parts.append(raw)
+    return _with_time(np.concatenate(parts), ticks_bits)
+
+
+def main(paths):
+    for path in paths:
+        data = read_log(path)
+        print("%s: %d records, fields %s" % (path, len(data), ', '.join(data.dtype.names)))
+        if len(data) > 1:
+            duration = (data['t_us'][-1] - data['t_us'][0]) / 1e6
+            print("  %.3f s, %.1f records/s" % (duration, (len(data) - 1) / duration if duration else 0))
+        for row in data[:5]:
+            print("  ", row)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,136 @@
+"""
+m5emu
+
+Host side emulation of the M5StickC for CPython, so the drivers in this
+repository (axp192.py, mpu6886.py, m5stickc_lcd.py, neomatrix.py, ...)
+run unmodified on a PC for profiling and regression tests.
+
+install() puts stand-ins for the MicroPython specific modules into
+sys.modules (machine, framebuf, neopixel, network, micropython,
+uasyncio), adds the MicroPython extensions of time and gc, and returns
+the emulated Board:
+
+    import m5emu
+    board = m5emu.install()
+    import m5stickc
+    board.axp.battery_voltage = 3.7
+    print(m5stickc.axp().battery_voltage())
+    print(board.stats())     # I2C/SPI transactions and bytes
+
+Every bus access is counted per bus and per device, see Board.stats().
+gc.mem_alloc() reports memory traced by tracemalloc, so it only changes
+while tracemalloc is tracing.
+"""
+
+import gc
+import os
+import sys
+import time
+
+from . import board as _board
+from . import framebuf, machine, micropython, neopixel, network
+from .board import Board, TICKS_PERIOD
+
+# repository root with the modules for the device
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# heap size reported by gc.mem_free(), about what an ESP32 without PSRAM has
+HEAP_SIZE = 111168
+
+ALIASES = {
+    'ubinascii': 'binascii',
+    'uerrno': 'errno',
+    'uhashlib': 'hashlib',
+    'uio': 'io',
+    'ujson': 'json',
+    'uos': 'os',
+    'ure': 're',
+    'uselect': 'select',
+    'usocket': 'socket',
+    'ustruct': 'struct',
+    'utime': 'time',
+}
+
+
+def ticks_us():
+    return _board.get().clock.us() % TICKS_PERIOD
+
+
+def ticks_ms():
+    return (_board.get().clock.us() // 1000) % TICKS_PERIOD
+
+
+def ticks_diff(a, b):
+    half = TICKS_PERIOD // 2
+    return ((a - b + half) % TICKS_PERIOD) - half
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) % TICKS_PERIOD
+
+
+def sleep_us(us):
+    _board.get().clock.sleep_us(us)
+
+
+def sleep_ms(ms):
+    _board.get().clock.sleep_us(ms * 1000)
+
+
+def sleep(s):
+    _board.get().clock.sleep_us(s * 1000000)
+
+
+def mem_alloc():
+    import tracemalloc
+    if not tracemalloc.is_tracing():
+        return 0
+    return tracemalloc.get_traced_memory()[0]
+
+
+def mem_free():
+    return max(0, HEAP_SIZE - mem_alloc())
+
+
+def _patch_time():
+    time.ticks_us = ticks_us
+    time.ticks_ms = ticks_ms
+    time.ticks_cpu = ticks_us
+    time.ticks_diff = ticks_diff
+    time.ticks_add = ticks_add
+    time.sleep_us = sleep_us
+    time.sleep_ms = sleep_ms
+    time.sleep = sleep
+
+
+def _patch_gc():
+    gc.mem_alloc = mem_alloc
+    gc.mem_free = mem_free
+    if not hasattr(gc, 'threshold'):
+        gc.threshold = lambda amount=None: -1
+
+
+def install(realtime=False, path=REPO):
+    """Install the stand-in modules and return a new Board.
+
+    realtime: really sleep in time.sleep*() instead of advancing the
+              emulated clock
+    path:     directory added to sys.path for the device modules
+    """
+    _board.current = Board(realtime)
+
+    for name, module in (('machine', machine), ('framebuf', framebuf),
+                         ('neopixel', neopixel), ('network', network),
+                         ('micropython', micropython)):
+        sys.modules[name] = module
+    from . import uasyncio
+    sys.modules['uasyncio'] = uasyncio
+    for alias, name in ALIASES.items():
+        sys.modules.setdefault(alias, __import__(name))
+
+    _patch_time()
+    _patch_gc()
+
+    if path and path not in sys.path:
+        sys.path.insert(0, path)
+    return _board.current
@@ -0,0 +1,131 @@
+"""
+board.py
+
+State of the emulated M5StickC: pins, I2C and SPI devices, clock and
+bus statistics. The fake machine, neopixel and network modules look up
+the current Board on every call, so install() can replace it between
+tests while driver objects created earlier keep working.
+"""
+
+import time as _time
+
+from .devices import AXP192, MPU6886, ST7735, Stats
+
+# install() replaces time.sleep
+_sleep = _time.sleep
+_perf_counter = _time.perf_counter
+
+# time.ticks_*() wrap at 2**TICKS_BITS on the ESP32 port
+TICKS_BITS = 30
+TICKS_PERIOD = 1 << TICKS_BITS
+
+current = None
+
+
+class Clock:
+    """Monotonic clock in us.
+
+    With realtime=False sleeps return immediately and advance the clock
+    instead, so driver init sequences with long delays run fast.
+    """
+
+    def __init__(self, realtime=False):
+        self.realtime = realtime
+        self.offset_us = 0
+        self._t0 = _perf_counter()
+
+    def us(self):
+        return int((_perf_counter() - self._t0) * 1e6) + self.offset_us
+
+    def sleep_us(self, us):
+        if us <= 0:
+            return
+        if self.realtime:
+            _sleep(us / 1e6)
+        else:
+            self.offset_us += int(us)
+
+
+class PinState:
+    def __init__(self, id):
+        self.id = id
+        self.value = 0
+        self.mode = None
+        self.pull = None
+        self.handler = None
+        self.trigger = 0
+
+
+class Board:
+    """Emulated M5StickC.
+
+    axp, imu:   AXP192 and MPU6886 on I2C port 0
+    lcd:        ST7735 on SPI 1 with CS on GPIO 5 and DC on GPIO 23
+    i2c_stats:  Stats of all I2C transactions
+    spi_stats:  Stats of all SPI writes
+    """
+
+    def __init__(self, realtime=False):
+        self.clock = Clock(realtime)
+        self.pins = {}
+        self.axp = AXP192()
+        self.imu = MPU6886()
+        self.lcd = ST7735(cs=5, dc=23)
+        self.i2c = {0: {self.axp.address: self.axp, self.imu.address: self.imu}}
+        self.spi = {1: [self.lcd]}
+        self.i2c_stats = Stats()
+        self.spi_stats = Stats()
+        self.neopixels = []
+        self.networks = []          # (ssid, password, bssid, channel, rssi, authmode)
+        self.freq = 240000000
+        self.rtc_memory = b''
+
+    def pin(self, id):
+        state = self.pins.get(id)
+        if state is None:
+            state = self.pins[id] = PinState(id)
+        return state
+
+    def set_pin(self, id, value):
+        """Drive an input pin from outside, calling its IRQ handler on a matching edge"""
+        from .machine import Pin
+        state = self.pin(id)
+        old, state.value = state.value, 1 if value else 0
+        if state.handler is None or old == state.value:
+            return
+        edge = Pin.IRQ_RISING if state.value else Pin.IRQ_FALLING
+        if state.trigger & edge:
+            state.handler(Pin(id))
+
+    def i2c_device(self, port, addr):
+        dev = self.i2c.get(port, {}).get(addr)
+        if dev is None:
+            raise OSError(19, 'ENODEV')
+        return dev
+
+    def reset_stats(self):
+        self.i2c_stats.reset()
+        self.spi_stats.reset()
+        for devices in self.i2c.values():
+            for dev in devices.values():
+                dev.stats.reset()
+        for devices in self.spi.values():
+            for dev in devices:
+                dev.stats.reset()
+
+    def stats(self):
+        """Return all counters as a dict"""
+        d = {'i2c': self.i2c_stats.as_dict(), 'spi': self.spi_stats.as_dict()}
+        for devices in self.i2c.values():
+            for dev in devices.values():
+                d[type(dev).__name__.lower()] = dev.stats.as_dict()
+        for devices in self.spi.values():
+            for dev in devices:
+                d[type(dev).__name__.lower()] = dev.stats.as_dict()
+        return d
+
+
+def get():
+    if current is None:
+        raise RuntimeError('m5emu.install() has not been called')
+    return current
@@ -0,0 +1,419 @@
+"""
+devices.py
+
+Register level emulators of the M5StickC peripherals.
+
+    AXP192    power management IC on I2C 0x34: ADC block, output control
+              (0x12), LDO voltages (0x28), IRQ status (0x44..0x47)
+    MPU6886   IMU on I2C 0x68: WHOAMI, configuration, data registers and
+              FIFO (0x72..0x74)
+    ST7735    LCD controller on SPI: decodes CASET/RASET/RAMWR into an
+              in-memory image of the display RAM
+
+Physical values (voltages, acceleration, ...) are plain attributes of
+the emulators and are converted to register contents when read, so a
+test sets e.g. axp.battery_voltage = 3.7 and checks what the driver
+returns.
+"""
+
+import struct
+
+
+class Stats:
+    """Transaction and byte counters"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.transactions = 0
+        self.bytes_written = 0
+        self.bytes_read = 0
+
+    def add(self, written=0, read=0):
+        self.transactions += 1
+        self.bytes_written += written
+        self.bytes_read += read
+
+    def as_dict(self):
+        return {
+            'transactions': self.transactions,
+            'bytes_written': self.bytes_written,
+            'bytes_read': self.bytes_read,
+        }
+
+    def __repr__(self):
+        return 'Stats(%d transactions, %d bytes written, %d bytes read)' % (
+            self.transactions, self.bytes_written, self.bytes_read)
+
+
+class RegisterDevice:
+    """I2C device with 8 bit register addresses and auto increment.
+
+    Subclasses fill registers on demand in update() and react to writes
+    in write_reg().
+    """
+
+    def __init__(self, address):
+        self.address = address
+        self.regs = bytearray(256)
+        self.pointer = 0
+        self.stats = Stats()
+
+    def update(self, reg, nbytes):
+        """Called before nbytes are read starting at reg"""
+
+    def next_reg(self, reg):
+        return (reg + 1) & 0xff
+
+    def read_reg(self, reg):
+        return self.regs[reg]
+
+    def write_reg(self, reg, value):
+        self.regs[reg] = value
+
+    def read(self, reg, nbytes):
+        self.update(reg, nbytes)
+        out = bytearray(nbytes)
+        for i in range(nbytes):
+            out[i] = self.read_reg(reg)
+            reg = self.next_reg(reg)
+        self.pointer = reg
+        return out
+
+    def write(self, reg, data):
+        for value in data:
+            self.write_reg(reg, value)
+            reg = self.next_reg(reg)
+        self.pointer = reg
+
+    # plain transfers: the first written byte selects the register
+    def transfer_write(self, data):
+        if data:
+            self.pointer = data[0]
+            self.write(data[0], data[1:])
+
+    def transfer_read(self, nbytes):
+        return self.read(self.pointer, nbytes)
+
+
+def _put12(regs, reg, value):
+    value = max(0, min(0xfff, int(round(value))))
+    regs[reg] = value >> 4
+    regs[reg + 1] = value & 0x0f
+
+
+def _put13(regs, reg, value):
+    value = max(0, min(0x1fff, int(round(value))))
+    regs[reg] = value >> 5
+    regs[reg + 1] = value & 0x1f
+
+
+class AXP192(RegisterDevice):
+    """AXP192 emulator.
+
+    Voltages in V, currents in mA, temperature in degree C.
+    press_button() sets the power key IRQ bits in 0x46, which are
+    cleared by writing 1 to them, as on the real chip.
+    """
+
+    ADDRESS = 0x34
+
+    def __init__(self):
+        super().__init__(self.ADDRESS)
+        self.battery_voltage = 4.0
+        self.battery_charge_current = 0.0
+        self.battery_discharge_current = 80.0
+        self.bus_voltage = 5.0
+        self.bus_current = 30.0
+        self.input_voltage = 0.0
+        self.input_current = 0.0
+        self.temperature = 40.0
+        self.aps_voltage = 4.0
+        self.vbus_present = True
+        self.battery_present = True
+        self.warning = False
+        self.regs[0x12] = 0x4d
+        self.regs[0x28] = 0xcc
+
+    # output control register 0x12
+    @property
+    def dcdc1(self):
+        return bool(self.regs[0x12] & 0x01)
+
+    @property
+    def dcdc3(self):
+        return bool(self.regs[0x12] & 0x02)
+
+    @property
+    def ldo2(self):
+        return bool(self.regs[0x12] & 0x04)
+
+    @property
+    def ldo3(self):
+        return bool(self.regs[0x12] & 0x08)
+
+    @property
+    def ldo2_voltage(self):
+        """LDO2 output voltage set in 0x28 (high nibble, 1.8 V + 0.1 V/step)"""
+        return 1.8 + 0.1 * (self.regs[0x28] >> 4)
+
+    @property
+    def ldo3_voltage(self):
+        return 1.8 + 0.1 * (self.regs[0x28] & 0x0f)
+
+    def press_button(self, long=False):
+        """Latch a power key press: short press sets bit 1, long press bit 0"""
+        self.regs[0x46] |= 0x01 if long else 0x02
+
+    def update(self, reg, nbytes):
+        r = self.regs
+        r[0x00] = (0x20 if self.vbus_present else 0) | \
+                  (0x04 if self.battery_charge_current > self.battery_discharge_current else 0)
+        r[0x01] = (0x20 if self.battery_present else 0) | \
+                  (0x40 if self.battery_charge_current > 0 else 0)
+        if self.warning:
+            r[0x47] |= 0x01
+        _put12(r, 0x56, self.input_voltage / 1.7e-3)
+        _put12(r, 0x58, self.input_current / 0.625)
+        _put12(r, 0x5a, self.bus_voltage / 1.7e-3)
+        _put12(r, 0x5c, self.bus_current / 0.375)
+        _put12(r, 0x5e, (self.temperature + 144.7) / 0.1)
+        power = int(self.battery_voltage / 1.1e-3 * self.battery_discharge_current / 0.5) & 0xffffff
+        r[0x70:0x73] = power.to_bytes(3, 'big')
+        _put12(r, 0x78, self.battery_voltage / 1.1e-3)
+        _put13(r, 0x7a, self.battery_charge_current / 0.5)
+        _put13(r, 0x7c, self.battery_discharge_current / 0.5)
+        _put12(r, 0x7e, self.aps_voltage / 1.4e-3)
+
+    def write_reg(self, reg, value):
+        if 0x44 <= reg <= 0x47:
+            # IRQ status: write 1 to clear
+            self.regs[reg] &= ~value
+        else:
+            self.regs[reg] = value
+
+
+# MPU6886 registers
+_GYRO_CONFIG = 0x1b
+_ACCEL_CONFIG = 0x1c
+_FIFO_EN = 0x23
+_ACCEL_XOUT_H = 0x3b
+_USER_CTRL = 0x6a
+_PWR_MGMT_1 = 0x6b
+_FIFO_COUNTH = 0x72
+_FIFO_R_W = 0x74
+_WHOAMI = 0x75
+
+
+class MPU6886(RegisterDevice):
+    """MPU6886 emulator.
+
+    accel in g, gyro in degree/s, temperature in degree C; raw values
+    are scaled with the full scale ranges set in GYRO_CONFIG and
+    ACCEL_CONFIG. sample() appends a record to the FIFO if it is enabled
+    (USER_CTRL bit 6) with the sources selected in FIFO_EN: accel (bit
+    3) and gyro (bit 4), temperature is included with either.
+    """
+
+    ADDRESS = 0x68
+    WHOAMI = 0x19
+    FIFO_SIZE = 1024
+
+    def __init__(self):
+        super().__init__(self.ADDRESS)
+        self.accel = (0.0, 0.0, 1.0)
+        self.gyro = (0.0, 0.0, 0.0)
+        self.temperature = 25.0
+        self.fifo = bytearray()
+        self.fifo_overflows = 0
+        self.reset()
+
+    def reset(self):
+        self.regs[:] = bytes(256)
+        self.regs[_WHOAMI] = self.WHOAMI
+        self.regs[_PWR_MGMT_1] = 0x40
+        self.fifo = bytearray()
+
+    def raw(self):
+        """Return the 14 data bytes ACCEL_XOUT_H..GYRO_ZOUT_L"""
+        a_res = (2.0, 4.0, 8.0, 16.0)[(self.regs[_ACCEL_CONFIG] >> 3) & 3] / 32768.0
+        g_res = (250.0, 500.0, 1000.0, 2000.0)[(self.regs[_GYRO_CONFIG] >> 3) & 3] / 32768.0
+
+        def clamp(v):
+            return max(-32768, min(32767, int(round(v))))
+
+        return struct.pack('>hhhhhhh',
+                           *([clamp(v / a_res) for v in self.accel] +
+                             [clamp((self.temperature - 25.0) * 326.8)] +
+                             [clamp(v / g_res) for v in self.gyro]))
+
+    def sample(self):
+        """Latch a new sample into the FIFO"""
+        if not self.regs[_USER_CTRL] & 0x40:
+            return
+        en = self.regs[_FIFO_EN]
+        data = self.raw()
+        record = b''
+        if en & 0x08:
+            record += data[0:6]
+        if en & 0x18:
+            record += data[6:8]
+        if en & 0x10:
+            record += data[8:14]
+        if len(self.fifo) + len(record) > self.FIFO_SIZE:
+            self.fifo_overflows += 1
+            del self.fifo[:len(record)]
+        self.fifo.extend(record)
+
+    def update(self, reg, nbytes):
+        if reg <= 0x48 and reg + nbytes > _ACCEL_XOUT_H:
+            self.regs[_ACCEL_XOUT_H:_ACCEL_XOUT_H + 14] = self.raw()
+        n = len(self.fifo)
+        self.regs[_FIFO_COUNTH] = n >> 8
+        self.regs[_FIFO_COUNTH + 1] = n & 0xff
+
+    def next_reg(self, reg):
+        # burst reads of FIFO_R_W keep popping the FIFO
+        if reg == _FIFO_R_W:
+            return reg
+        return (reg + 1) & 0xff
+
+    def read_reg(self, reg):
+        if reg == _FIFO_R_W:
+            if not self.fifo:
+                return 0xff
+            value = self.fifo[0]
+            del self.fifo[0]
+            return value
+        return self.regs[reg]
+
+    def write_reg(self, reg, value):
+        if reg == _PWR_MGMT_1 and value & 0x80:
+            self.reset()
+        elif reg == _USER_CTRL and value & 0x04:
+            # FIFO reset, the bit clears itself
+            self.fifo = bytearray()
+            self.regs[reg] = value & ~0x04
+        else:
+            self.regs[reg] = value
+
+
+class ST7735:
+    """ST7735 emulator.
+
+    Commands are bytes sent with DC low, their parameters and pixel data
+    are sent with DC high while CS is low. RAMWR data is stored in the
+    132x162 display RAM within the window set by CASET/RASET, with the
+    RGB565 values big endian as the controller receives them.
+    MADCTL is recorded but not applied to the addressing.
+    """
+
+    RAM_WIDTH = 132
+    RAM_HEIGHT = 162
+
+    def __init__(self, cs=5, dc=23):
+        self.cs = cs
+        self.dc = dc
+        self.stats = Stats()
+        self.reset()
+
+    def reset(self):
+        self.ram = bytearray(self.RAM_WIDTH * self.RAM_HEIGHT * 2)
+        self.x0, self.x1 = 0, self.RAM_WIDTH - 1
+        self.y0, self.y1 = 0, self.RAM_HEIGHT - 1
+        self.madctl = 0
+        self.colmod = 0x06
+        self.sleeping = True
+        self.display_on = False
+        self.inverted = False
+        self.command = None
+        self.params = bytearray()
+        self.commands = {}          # command -> number of times sent
+        self.frames = 0             # completed RAMWR windows
+        self._pixel = 0
+        self._pending = bytearray()
+
+    def spi_write(self, data, dc):
+        if not dc:
+            for cmd in data:
+                self._begin(cmd)
+        else:
+            self._data(data)
+
+    def _begin(self, cmd):
+        self.command = cmd
+        self.params = bytearray()
+        self.commands[cmd] = self.commands.get(cmd, 0) + 1
+        if cmd == 0x01:
+            commands = self.commands
+            self.reset()
+            self.commands = commands
+        elif cmd == 0x11:
+            self.sleeping = False
+        elif cmd == 0x10:
+            self.sleeping = True
+        elif cmd == 0x29:
+            self.display_on = True
+        elif cmd == 0x28:
+            self.display_on = False
+        elif cmd == 0x21:
+            self.inverted = True
+        elif cmd == 0x20:
+            self.inverted = False
+        elif cmd == 0x2c:
+            self._pixel = 0
+            self._pending = bytearray()
+
+    def _data(self, data):
+        cmd = self.command
+        if cmd == 0x2c:
+            self._ramwr(data)
+            return
+        self.params.extend(data)
+        p = self.params
+        if cmd == 0x2a and len(p) >= 4:
+            self.x0, self.x1 = (p[0] << 8) | p[1], (p[2] << 8) | p[3]
+        elif cmd == 0x2b and len(p) >= 4:
+            self.y0, self.y1 = (p[0] << 8) | p[1], (p[2] << 8) | p[3]
+        elif cmd == 0x36 and p:
+            self.madctl = p[0]
+        elif cmd == 0x3a and p:
+            self.colmod = p[0]
+
+    def _ramwr(self, data):
+        w = self.x1 - self.x0 + 1
+        h = self.y1 - self.y0 + 1
+        if w <= 0 or h <= 0:
+            return
+        n = w * h
+        buf = self._pending + data
+        i = 0
+        while i + 1 < len(buf):
+            x = self.x0 + self._pixel % w
+            y = self.y0 + self._pixel // w
+            if x < self.RAM_WIDTH and y < self.RAM_HEIGHT:
+                o = 2 * (y * self.RAM_WIDTH + x)
+                self.ram[o:o + 2] = buf[i:i + 2]
+            i += 2
+            self._pixel += 1
+            if self._pixel == n:
+                self._pixel = 0
+                self.frames += 1
+        self._pending = bytearray(buf[i:])
+
+    def pixel(self, x, y):
+        """Return the RGB565 value at display RAM position x, y"""
+        o = 2 * (y * self.RAM_WIDTH + x)
+        return (self.ram[o] << 8) | self.ram[o + 1]
+
+    def image(self, x=26, y=1, width=80, height=160):
+        """Return a window of the display RAM as RGB565 bytes.
+
+        The defaults are the visible 80x160 area of the M5StickC panel.
+        """
+        out = bytearray()
+        for row in range(y, y + height):
+            o = 2 * (row * self.RAM_WIDTH + x)
+            out.extend(self.ram[o:o + 2 * width])
+        return out
@@ -0,0 +1,153 @@
+"""
+framebuf.py
+
+Pure Python stand-in for the MicroPython framebuf module, with the same
+memory layout for RGB565 (little endian), GS8 and the MONO formats.
+
+text() draws a deterministic placeholder glyph (8x8, the bits of the
+character code in every row) instead of the MicroPython font: tests can
+compare images, but text is not readable.
+"""
+
+MONO_VLSB = 0
+RGB565 = 1
+GS4_HMSB = 2
+MONO_HLSB = 3
+MONO_HMSB = 4
+GS8 = 6
+MVLSB = MONO_VLSB
+
+
+class FrameBuffer:
+
+    def __init__(self, buffer, width, height, format, stride=None):
+        if format not in (MONO_VLSB, RGB565, MONO_HLSB, MONO_HMSB, GS8):
+            raise ValueError('invalid format')
+        self.buf = buffer
+        self.width = width
+        self.height = height
+        self.format = format
+        self.stride = width if stride is None else stride
+
+    def _get(self, x, y):
+        b = self.buf
+        f = self.format
+        if f == RGB565:
+            i = 2 * (y * self.stride + x)
+            return b[i] | (b[i + 1] << 8)
+        if f == GS8:
+            return b[y * self.stride + x]
+        if f == MONO_VLSB:
+            return (b[(y >> 3) * self.stride + x] >> (y & 7)) & 1
+        i = (y * self.stride + x) >> 3
+        shift = (7 - (x & 7)) if f == MONO_HLSB else (x & 7)
+        return (b[i] >> shift) & 1
+
+    def _set(self, x, y, c):
+        b = self.buf
+        f = self.format
+        if f == RGB565:
+            i = 2 * (y * self.stride + x)
+            b[i] = c & 0xff
+            b[i + 1] = (c >> 8) & 0xff
+            return
+        if f == GS8:
+            b[y * self.stride + x] = c & 0xff
+            return
+        if f == MONO_VLSB:
+            i = (y >> 3) * self.stride + x
+            bit = 1 << (y & 7)
+        else:
+            i = (y * self.stride + x) >> 3
+            bit = 1 << ((7 - (x & 7)) if f == MONO_HLSB else (x & 7))
+        if c & 1:
+            b[i] |= bit
+        else:
+            b[i] &= ~bit & 0xff
+
+    def pixel(self, x, y, c=None):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        if c is None:
+            return self._get(x, y)
+        self._set(x, y, c)
+
+    def fill_rect(self, x, y, w, h, c):
+        x0 = max(0, x)
+        y0 = max(0, y)
+        x1 = min(self.width, x + w)
+        y1 = min(self.height, y + h)
+        if self.format == RGB565:
+            row = bytes((c & 0xff, (c >> 8) & 0xff)) * max(0, x1 - x0)
+            for yy in range(y0, y1):
+                i = 2 * (yy * self.stride + x0)
+                self.buf[i:i + len(row)] = row
+            return
+        for yy in range(y0, y1):
+            for xx in range(x0, x1):
+                self._set(xx, yy, c)
+
+    def fill(self, c):
+        self.fill_rect(0, 0, self.width, self.height, c)
+
+    def hline(self, x, y, w, c):
+        self.fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self.fill_rect(x, y, 1, h, c)
+
+    def rect(self, x, y, w, h, c):
+        self.hline(x, y, w, c)
+        self.hline(x, y + h - 1, w, c)
+        self.vline(x, y, h, c)
+        self.vline(x + w - 1, y, h, c)
+
+    def line(self, x0, y0, x1, y1, c):
+        dx = abs(x1 - x0)
+        dy = -abs(y1 - y0)
+        sx = 1 if x0 < x1 else -1
+        sy = 1 if y0 < y1 else -1
+        err = dx + dy
+        while True:
+            self.pixel(x0, y0, c)
+            if x0 == x1 and y0 == y1:
+                break
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x0 += sx
+            if e2 <= dx:
+                err += dx
+                y0 += sy
+
+    def text(self, s, x, y, c=1):
+        for ch in s:
+            code = ord(ch) & 0xff
+            for row in range(8):
+                for col in range(8):
+                    if code & (0x80 >> col):
+                        self.pixel(x + col, y + row, c)
+            x += 8
+
+    def scroll(self, xstep, ystep):
+        w, h = self.width, self.height
+        ys = range(h - 1, -1, -1) if ystep > 0 else range(h)
+        xs = range(w - 1, -1, -1) if xstep > 0 else range(w)
+        for y in ys:
+            sy = y - ystep
+            if not 0 <= sy < h:
+                continue
+            for x in xs:
+                sx = x - xstep
+                if 0 <= sx < w:
+                    self._set(x, y, self._get(sx, sy))
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        for sy in range(fbuf.height):
+            for sx in range(fbuf.width):
+                c = fbuf._get(sx, sy)
+                if c == key:
+                    continue
+                if palette is not None:
+                    c = palette._get(c, 0)
+                self.pixel(x + sx, y + sy, c)
@@ -0,0 +1,185 @@
+"""
+machine.py
+
+Stand-in for the MicroPython machine module: Pin, I2C, SPI and RTC
+backed by the emulated Board, plus the few module functions the code
+on the device uses.
+"""
+
+from . import board as _board
+
+
+class Pin:
+    IN = 1
+    OUT = 3
+    OPEN_DRAIN = 7
+    PULL_UP = 2
+    PULL_DOWN = 1
+    IRQ_RISING = 1
+    IRQ_FALLING = 2
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self.init(mode, pull, value)
+
+    def init(self, mode=-1, pull=-1, value=None):
+        state = _board.get().pin(self.id)
+        if mode != -1:
+            state.mode = mode
+        if pull != -1:
+            state.pull = pull
+            if pull == self.PULL_UP and state.mode == self.IN:
+                state.value = 1
+        if value is not None:
+            state.value = 1 if value else 0
+
+    def value(self, v=None):
+        state = _board.get().pin(self.id)
+        if v is None:
+            return state.value
+        state.value = 1 if v else 0
+
+    __call__ = value
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING):
+        state = _board.get().pin(self.id)
+        state.handler = handler
+        state.trigger = trigger
+
+    def __repr__(self):
+        return 'Pin(%d)' % self.id
+
+
+class I2C:
+    """Hardware I2C bus dispatching to the emulated devices.
+
+    Every call is one transaction; the register address counts as a
+    written byte.
+    """
+
+    def __init__(self, id=0, scl=None, sda=None, freq=400000):
+        self.id = id
+        self.init(scl=scl, sda=sda, freq=freq)
+
+    def init(self, scl=None, sda=None, freq=400000):
+        self.scl = scl
+        self.sda = sda
+        self.freq = freq
+
+    def _device(self, addr, written, read):
+        b = _board.get()
+        dev = b.i2c_device(self.id, addr)
+        b.i2c_stats.add(written, read)
+        dev.stats.add(written, read)
+        return dev
+
+    def scan(self):
+        return sorted(_board.get().i2c.get(self.id, {}))
+
+    def readfrom_mem(self, addr, memaddr, nbytes, addrsize=8):
+        return bytes(self._device(addr, 1, nbytes).read(memaddr, nbytes))
+
+    def readfrom_mem_into(self, addr, memaddr, buf, addrsize=8):
+        buf[:] = self._device(addr, 1, len(buf)).read(memaddr, len(buf))
+
+    def writeto_mem(self, addr, memaddr, buf, addrsize=8):
+        self._device(addr, 1 + len(buf), 0).write(memaddr, bytes(buf))
+
+    def readfrom(self, addr, nbytes, stop=True):
+        return bytes(self._device(addr, 0, nbytes).transfer_read(nbytes))
+
+    def readfrom_into(self, addr, buf, stop=True):
+        buf[:] = self._device(addr, 0, len(buf)).transfer_read(len(buf))
+
+    def writeto(self, addr, buf, stop=True):
+        self._device(addr, len(buf), 0).transfer_write(bytes(buf))
+        return len(buf)
+
+
+class SPI:
+    """SPI bus: writes go to the devices on the bus whose CS pin is low"""
+
+    MSB = 0
+    LSB = 1
+
+    def __init__(self, id=1, baudrate=1000000, polarity=0, phase=0, bits=8,
+                 firstbit=MSB, sck=None, mosi=None, miso=None):
+        self.id = id
+        self.init(baudrate=baudrate)
+
+    def init(self, baudrate=1000000, **kwargs):
+        self.baudrate = baudrate
+
+    def deinit(self):
+        pass
+
+    def write(self, buf):
+        b = _board.get()
+        b.spi_stats.add(len(buf))
+        for dev in b.spi.get(self.id, ()):
+            if not b.pin(dev.cs).value:
+                dev.stats.add(len(buf))
+                dev.spi_write(bytes(buf), b.pin(dev.dc).value)
+
+    def read(self, nbytes, write=0x00):
+        _board.get().spi_stats.add(nbytes, nbytes)
+        return bytes(nbytes)
+
+    def readinto(self, buf, write=0x00):
+        _board.get().spi_stats.add(len(buf), len(buf))
+        buf[:] = bytes(len(buf))
+
+    def write_readinto(self, write_buf, read_buf):
+        self.write(write_buf)
+        read_buf[:] = bytes(len(read_buf))
+
+
+class RTC:
+    def memory(self, data=None):
+        b = _board.get()
+        if data is None:
+            return b.rtc_memory
+        b.rtc_memory = bytes(data)
+
+
+def freq(hz=None):
+    b = _board.get()
+    if hz is None:
+        return b.freq
+    if hz not in (80000000, 160000000, 240000000):
+        raise ValueError('frequency must be 80MHz, 160MHz or 240MHz')
+    b.freq = hz
+
+
+def unique_id():
+    return b'\x24\x0a\xc4\x00\x00\x01'
+
+
+def idle():
+    pass
+
+
+def reset():
+    raise SystemExit('machine.reset()')
+
+
+def deepsleep(ms=0):
+    raise SystemExit('machine.deepsleep(%d)' % ms)
+
+
+def lightsleep(ms=0):
+    _board.get().clock.sleep_us(ms * 1000)
+
+
+def disable_irq():
+    return 0
+
+
+def enable_irq(state=0):
+    pass
@@ -0,0 +1,47 @@
+"""
+micropython.py
+
+Stand-in for the micropython module: const() and the code emitter
+decorators are passed through.
+"""
+
+
+def const(x):
+    return x
+
+
+def native(f):
+    return f
+
+
+def viper(f):
+    return f
+
+
+def opt_level(level=None):
+    return 0
+
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+
+def schedule(func, arg):
+    func(arg)
+
+
+def heap_lock():
+    pass
+
+
+def heap_unlock():
+    return 0
+
+
+def mem_info(verbose=False):
+    import gc
+    print('mem: total=%d, current=%d' % (gc.mem_alloc() + gc.mem_free(), gc.mem_alloc()))
+
+
+def kbd_intr(chr):
+    pass
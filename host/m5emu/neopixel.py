@@ -0,0 +1,44 @@
+"""
+neopixel.py
+
+Stand-in for the MicroPython neopixel module. write() only counts the
+frames and bytes that would go out on the data line; the last frame is
+kept in `sent` for inspection.
+"""
+
+from . import board as _board
+from .devices import Stats
+
+
+class NeoPixel:
+    ORDER = (1, 0, 2, 3)
+
+    def __init__(self, pin, n, bpp=3, timing=1):
+        self.pin = pin
+        self.n = n
+        self.bpp = bpp
+        self.timing = timing
+        self.buf = bytearray(n * bpp)
+        self.sent = bytes(n * bpp)
+        self.stats = Stats()
+        _board.get().neopixels.append(self)
+
+    def __len__(self):
+        return self.n
+
+    def __setitem__(self, index, val):
+        offset = index * self.bpp
+        for i in range(self.bpp):
+            self.buf[offset + self.ORDER[i]] = val[i]
+
+    def __getitem__(self, index):
+        offset = index * self.bpp
+        return tuple(self.buf[offset + self.ORDER[i]] for i in range(self.bpp))
+
+    def fill(self, color):
+        for i in range(self.n):
+            self[i] = color
+
+    def write(self):
+        self.stats.add(len(self.buf))
+        self.sent = bytes(self.buf)
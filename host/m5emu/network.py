@@ -0,0 +1,97 @@
+"""
+network.py
+
+Stand-in for the ESP32 network module. Access points are taken from
+Board.networks as (ssid, password, bssid, channel, rssi, authmode);
+connect() succeeds immediately if SSID and password match one of them.
+"""
+
+from . import board as _board
+
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 1000
+STAT_CONNECTING = 1001
+STAT_GOT_IP = 1010
+STAT_NO_AP_FOUND = 201
+STAT_WRONG_PASSWORD = 202
+STAT_BEACON_TIMEOUT = 200
+STAT_ASSOC_FAIL = 203
+STAT_HANDSHAKE_TIMEOUT = 204
+
+AUTH_OPEN = 0
+AUTH_WPA2_PSK = 3
+
+
+class WLAN:
+
+    def __init__(self, interface=STA_IF):
+        self.interface = interface
+        self._active = False
+        self._status = STAT_IDLE
+        self._ap = None
+        self._config = {'essid': 'ESP_EMU', 'mac': b'\x24\x0a\xc4\x00\x00\x01', 'channel': 1}
+
+    def active(self, is_active=None):
+        if is_active is None:
+            return self._active
+        self._active = bool(is_active)
+        if not self._active:
+            self.disconnect()
+
+    def scan(self):
+        return [(ssid.encode(), bssid, channel, rssi, authmode, False)
+                for ssid, password, bssid, channel, rssi, authmode in _board.get().networks]
+
+    def connect(self, ssid=None, password=None, bssid=None):
+        if not self._active:
+            raise OSError('Wifi Not Started')
+        self._ap = None
+        self._status = STAT_NO_AP_FOUND
+        for ap in _board.get().networks:
+            if ap[0] != ssid or (bssid is not None and ap[2] != bytes(bssid)):
+                continue
+            if ap[1] and ap[1] != password:
+                self._status = STAT_WRONG_PASSWORD
+                return
+            self._ap = ap
+            self._status = STAT_GOT_IP
+            return
+
+    def disconnect(self):
+        self._ap = None
+        self._status = STAT_IDLE
+
+    def isconnected(self):
+        return self._status == STAT_GOT_IP
+
+    def status(self, param=None):
+        if param is None:
+            return self._status
+        if param == 'rssi':
+            if self._ap is None:
+                raise OSError('STA is not connected')
+            return self._ap[4]
+        raise ValueError('unknown status param')
+
+    def config(self, *args, **kwargs):
+        if kwargs:
+            self._config.update(kwargs)
+            return None
+        key = args[0]
+        if self._ap is not None:
+            if key == 'essid':
+                return self._ap[0]
+            if key == 'channel':
+                return self._ap[3]
+            if key == 'bssid':
+                return self._ap[2]
+        return self._config.get(key)
+
+    def ifconfig(self, config=None):
+        if self.interface == AP_IF:
+            return ('192.168.4.1', '255.255.255.0', '192.168.4.1', '8.8.8.8')
+        if self.isconnected():
+            return ('192.168.1.42', '255.255.255.0', '192.168.1.1', '192.168.1.1')
+        return ('0.0.0.0', '0.0.0.0', '0.0.0.0', '0.0.0.0')
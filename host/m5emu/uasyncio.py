@@ -0,0 +1,33 @@
+"""
+uasyncio.py
+
+uasyncio v3 API on top of CPython asyncio: sleep_ms(), wait_for_ms()
+and StreamWriter.awrite()/aclose().
+"""
+
+import asyncio as _asyncio
+from asyncio import *  # noqa: F401,F403
+
+
+async def sleep_ms(ms):
+    await _asyncio.sleep(ms / 1000)
+
+
+async def wait_for_ms(aw, timeout):
+    return await _asyncio.wait_for(aw, timeout / 1000)
+
+
+async def _awrite(self, buf, off=0, sz=-1):
+    if sz == -1:
+        sz = len(buf) - off
+    self.write(bytes(buf[off:off + sz]))
+    await self.drain()
+
+
+async def _aclose(self):
+    self.close()
+    await self.wait_closed()
+
+
+_asyncio.StreamWriter.awrite = _awrite
+_asyncio.StreamWriter.aclose = _aclose
@@ -0,0 +1,251 @@
+"""
+test_host.py
+
+Host tests under the M5StickC emulator (m5emu): the Sampler against the
+drivers, the httpd request parser, the WiFi profile store and the data
+logger file format.
+
+    cd host && python -m pytest -q
+"""
+
+import os
+
+import pytest
+
+import m5emu
+
+
+@pytest.fixture
+def board():
+    b = m5emu.install()
+    b.axp.input_voltage = 4.9
+    b.axp.input_current = 120.0
+    b.axp.battery_charge_current = 50.0
+    b.imu.accel = (0.02, -0.01, 0.99)
+    b.imu.gyro = (1.5, -2.0, 3.0)
+    b.imu.temperature = 31.0
+    return b
+
+
+@pytest.fixture
+def drivers(board):
+    import i2c_bus
+    from axp192 import AXP192
+    from mpu6886 import MPU6886
+    axp = AXP192(i2c_bus.get(0))
+    axp.setup()
+    return axp, MPU6886(i2c_bus.get(0))
+
+
+# Sampler
+
+def driver_value(axp, imu, name):
+    if name.startswith('accel_'):
+        return imu.getAccelData()['xyz'.index(name[-1])]
+    if name.startswith('gyro_'):
+        return imu.getGyroData()['xyz'.index(name[-1])]
+    if name == 'imu_temperature':
+        return imu.getTempData()
+    return getattr(axp, name)()
+
+
+def test_sampler_matches_drivers(board, drivers):
+    from m5stickc import sampling
+    axp, imu = drivers
+    channels = tuple(sampling.CHANNELS)
+    s = sampling.Sampler(axp, imu, channels)
+    s.sample()
+    for name in channels:
+        assert s[name] == pytest.approx(float(driver_value(axp, imu, name)), rel=1e-5, abs=1e-3), name
+    assert s.transactions < len(channels)
+
+
+def test_sampler_add_channels_keeps_identity(board, drivers):
+    from m5stickc import sampling
+    axp, imu = drivers
+    s = sampling.Sampler(axp, None, sampling.POWER)
+    s.sample()
+    assert s.add_channels(sampling.ACCEL, imu=imu) == 3
+    assert s.channels == sampling.POWER + sampling.ACCEL
+    assert s.latest(1000)[s.index['accel_z']] == pytest.approx(0.99, abs=1e-3)
+    assert s.add_channels(sampling.ACCEL) == 0
+
+
+# httpd.Request
+
+def parse(raw, size=256, chunk=None):
+    import httpd
+    req = httpd.Request(size)
+    req.reset()
+    pos = 0
+    while True:
+        mv = req.free()
+        n = min(len(mv), chunk or len(raw), len(raw) - pos)
+        mv[:n] = raw[pos:pos + n]
+        pos += n
+        if req.feed(n):
+            return req
+
+
+def status_of(raw, size=256):
+    import httpd
+    with pytest.raises(httpd.HTTPError) as e:
+        parse(raw, size)
+    return e.value.status
+
+
+def test_request_form_in_small_chunks(board):
+    body = b'ssid=My+%22Net%22&password=p%26ss%C3%BC'
+    raw = b'POST /configure HTTP/1.1\r\nContent-Type: application/x-www-form-urlencoded\r\n' \
+          b'Content-Length: %d\r\n\r\n' % len(body) + body
+    req = parse(raw, chunk=7)
+    assert req.method == 'POST'
+    assert req.path == '/configure'
+    assert req.form() == {'ssid': 'My "Net"', 'password': 'p&ssü'}
+
+
+def test_request_body_may_use_whole_buffer(board):
+    body = b'x=' + b'a' * 150
+    raw = b'POST / HTTP/1.0\r\nX-Filler: ' + b'b' * 150 + b'\r\nContent-Length: %d\r\n\r\n' % len(body) + body
+    assert len(raw) > 256
+    assert bytes(parse(raw, chunk=64).body()) == body
+
+
+@pytest.mark.parametrize('raw, status', [
+    (b'GET /%ff HTTP/1.0\r\n\r\n', 400),
+    (b'GET /?ssid=a%ff HTTP/1.0\r\n\r\n', None),
+    (b'POST / HTTP/1.0\r\nContent-Length: -5\r\n\r\n', 400),
+    (b'POST / HTTP/1.0\r\nContent-Length: x\r\n\r\n', 400),
+    (b'POST / HTTP/1.0\r\nContent-Length: 300\r\n\r\n', 413),
+    (b'GET / HTTP/1.0\r\nX: ' + b'a' * 300 + b'\r\n\r\n', 431),
+    (b'GARBAGE\r\n\r\n', 400),
+])
+def test_request_errors(board, raw, status):
+    import httpd
+    if status is None:
+        # the query string is only decoded by form()
+        with pytest.raises(httpd.HTTPError) as e:
+            parse(raw).form()
+        assert e.value.status == 400
+    else:
+        assert status_of(raw) == status
+
+
+def test_escape(board):
+    import httpd
+    assert httpd.escape('a"b<c>&d') == 'a&quot;b&lt;c&gt;&amp;d'
+
+
+# ProfileStore
+
+def test_profiles_round_trip(tmp_path):
+    from wifi_profiles import ProfileStore
+    path = str(tmp_path / 'wifi.bin')
+    store = ProfileStore(path)
+    store.set('home', 'secret', priority=2)
+    store.set('café "guest"', '')
+    store.record_success('home', b'\x01\x02\x03\x04\x05\x06', 6)
+    store.record_success('café "guest"', None, 11)
+
+    loaded = ProfileStore(path)
+    assert len(loaded) == 2
+    p = loaded.get('home')
+    assert (p.password, p.bssid, p.channel, p.priority) == ('secret', b'\x01\x02\x03\x04\x05\x06', 6, 2)
+    assert loaded.most_recent().ssid == 'café "guest"'
+    assert [p.ssid for p in loaded.ordered()] == ['home', 'café "guest"']
+    assert not os.path.exists(path + '.tmp')
+
+
+def test_profiles_legacy_import(tmp_path):
+    from wifi_profiles import ProfileStore
+    legacy = tmp_path / 'wifi.dat'
+    legacy.write_text('home;secret\nsemi;colon;in;password\n')
+    path = str(tmp_path / 'wifi.bin')
+    store = ProfileStore(path, legacy=str(legacy))
+    assert store.password('home') == 'secret'
+    assert store.password('semi') == 'colon;in;password'
+    assert os.path.exists(path)
+    assert ProfileStore(path).password('home') == 'secret'
+
+
+def test_profiles_full_store_keeps_new_profile(tmp_path):
+    from wifi_profiles import ProfileStore
+    store = ProfileStore(str(tmp_path / 'wifi.bin'), max_profiles=2)
+    store.set('a', '1')
+    store.set('b', '2')
+    store.record_success('a')
+    store.set('c', '3')
+    assert 'c' in store and 'a' in store and 'b' not in store
+
+
+def test_profiles_invalid_file(tmp_path):
+    from wifi_profiles import ProfileStore
+    path = tmp_path / 'wifi.bin'
+    path.write_bytes(b'WPS\x01\x05\x20abc')
+    assert len(ProfileStore(str(path))) == 0
+
+
+# DataLogger
+
+def test_datalog_round_trip(board, drivers, tmp_path):
+    import datalog
+    from datalog_reader import read_logs
+    from m5stickc import sampling
+    axp, imu = drivers
+    s = sampling.Sampler(axp, imu, sampling.POWER)
+    prefix = str(tmp_path / 'log')
+    log = datalog.DataLogger(prefix, block_size=256, max_file_size=1024)
+    log.add_source(*datalog.sampler_source(s))
+    log.add_source(*datalog.imu_source(imu))
+    log.start()
+    for _ in range(100):
+        log.sample()
+        log.flush()
+    log.close()
+
+    data = read_logs(prefix)
+    assert len(data) == 100
+    assert len(os.listdir(str(tmp_path))) > 1
+    assert data['battery_voltage'][0] == pytest.approx(s['battery_voltage'])
+    assert data['az'][0] == round(0.99 / imu.aRes)
+    assert list(data.dtype.names) == ['t_us'] + list(sampling.POWER) + list(datalog.IMU_NAMES)
+
+
+def test_datalog_imu_fifo(board, drivers, tmp_path):
+    import time
+    import datalog
+    from datalog_reader import read_logs
+    axp, imu = drivers
+    fifo = datalog.ImuFifo(imu)
+    prefix = str(tmp_path / 'imu')
+    log = datalog.DataLogger(prefix, block_size=512)
+    log.add_bulk_source(fifo)
+    log.start()
+    produced = 0
+    for i in range(40):
+        for _ in range(i % 5 + 4):
+            board.imu.sample()
+            produced += 1
+        time.sleep_ms(25)
+        log.drain()
+        log.flush()
+    while log.drain():
+        pass
+    log.close()
+
+    data = read_logs(prefix)
+    assert len(data) == produced
+    assert fifo.resets == 0 and log.dropped == 0
+    assert (data['gz'] == round(3.0 / imu.gRes)).all()
+    assert (data['t_us'][1:] > data['t_us'][:-1]).all()
+
+
+def test_datalog_fifo_misaligned_resets(board, drivers):
+    import datalog
+    axp, imu = drivers
+    fifo = datalog.ImuFifo(imu)
+    board.imu.sample()
+    board.imu.fifo.extend(b'\x00\x00')
+    assert fifo.drain() == 0
+    assert fifo.resets == 1
+    assert len(board.imu.fifo) == 0
@@ -0,0 +1,387 @@
+"""
+httpd.py
+
+Small HTTP/1.0 helpers for the servers running on the device (WiFi
+portal, metrics).
+
+Responses are assembled in one reusable buffer: the body is written
+first, then the status line and headers (including Content-Length) are
+put directly in front of it, and the whole response goes out with a
+single sendall(). On the ESP32 every send call becomes at least one TCP
+segment, so this keeps pages to as few segments as possible.
+"""
+
+import os
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    asyncio = None
+
+# uasyncio v3 features used by the asyncio servers
+ASYNCIO_API = ('create_task', 'start_server', 'wait_for', 'Lock', 'TimeoutError', 'sleep_ms')
+
+STATUS = {
+    200: "OK",
+    204: "No Content",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+}
+
+# room reserved in front of the body for status line and headers
+HEADER_ROOM = 192
+
+CHUNK_SIZE = 512
+
+
+class Response:
+    """Reusable response buffer.
+
+    resp.begin()
+    resp.write(b"<html>...")
+    resp.send(client)
+    """
+
+    def __init__(self, size=2048):
+        self.buf = bytearray(size)
+        self.mv = memoryview(self.buf)
+        self.pos = HEADER_ROOM
+
+    def begin(self):
+        """Start a new response, dropping everything written before"""
+        self.pos = HEADER_ROOM
+
+    def _reserve(self, n):
+        if self.pos + n > len(self.buf):
+            size = len(self.buf)
+            while self.pos + n > size:
+                size *= 2
+            buf = bytearray(size)
+            buf[:self.pos] = self.mv[:self.pos]
+            self.buf = buf
+            self.mv = memoryview(buf)
+
+    def write(self, data):
+        """Append data (bytes or str) to the body"""
+        if isinstance(data, str):
+            data = data.encode()
+        n = len(data)
+        self._reserve(n)
+        self.mv[self.pos:self.pos + n] = data
+        self.pos += n
+
+    def readinto_from(self, f):
+        """Append the rest of file f to the body"""
+        while True:
+            self._reserve(CHUNK_SIZE)
+            n = f.readinto(self.mv[self.pos:self.pos + CHUNK_SIZE])
+            if not n:
+                break
+            self.pos += n
+
+    def body_length(self):
+        return self.pos - HEADER_ROOM
+
+    def finish(self, status=200, content_type="text/html", headers=None):
+        """Put status line and headers in front of the body.
+
+        Returns a memoryview of the complete response.
+        """
+        head = "HTTP/1.0 {} {}\r\nContent-Type: {}\r\nContent-Length: {}\r\n".format(
+            status, STATUS.get(status, "OK"), content_type, self.body_length())
+        if headers:
+            for name, value in headers.items():
+                head += "{}: {}\r\n".format(name, value)
+        head = (head + "Connection: close\r\n\r\n").encode()
+        start = HEADER_ROOM - len(head)
+        if start < 0:
+            raise ValueError("headers too long")
+        self.mv[start:HEADER_ROOM] = head
+        return self.mv[start:self.pos]
+
+    def send(self, client, status=200, content_type="text/html", headers=None):
+        """Send the response with a single write"""
+        client.sendall(self.finish(status, content_type, headers))
+
+
+def find_static(path):
+    """Return (filename, gzipped) for a static file, preferring path + '.gz'"""
+    for name, gzipped in ((path + ".gz", True), (path, False)):
+        try:
+            os.stat(name)
+            return name, gzipped
+        except OSError:
+            pass
+    return None, False
+
+
+def send_file(client, resp, path, content_type="text/html"):
+    """Send a static file. A gzip compressed copy (path + '.gz') is
+    preferred if present on flash. Returns False if the file is missing."""
+    name, gzipped = find_static(path)
+    if name is None:
+        return False
+    resp.begin()
+    with open(name, "rb") as f:
+        resp.readinto_from(f)
+    headers = {"Content-Encoding": "gzip"} if gzipped else None
+    resp.send(client, 200, content_type, headers)
+    return True
+
+
+class HTTPError(Exception):
+    """Raised for requests that cannot be served, carries the HTTP status"""
+
+    def __init__(self, status, message=None):
+        super().__init__(message or STATUS.get(status, "Error"))
+        self.status = status
+
+
+def _decode(data):
+    try:
+        return data.decode("utf-8")
+    except UnicodeError:
+        raise HTTPError(400, "invalid UTF-8")
+
+
+def _hexval(c):
+    if 0x30 <= c <= 0x39:       # 0-9
+        return c - 0x30
+    c |= 0x20                   # lower case
+    if 0x61 <= c <= 0x66:       # a-f
+        return c - 0x61 + 10
+    return -1
+
+
+def unquote_plus(data):
+    """Decode an application/x-www-form-urlencoded value to str.
+
+    Raises HTTPError(400) if the result is not valid UTF-8.
+    """
+    out = bytearray()
+    i = 0
+    n = len(data)
+    while i < n:
+        c = data[i]
+        if c == 0x2b:           # '+'
+            c = 0x20
+        elif c == 0x25 and i + 2 < n:   # '%XX'
+            hi = _hexval(data[i + 1])
+            lo = _hexval(data[i + 2])
+            if hi >= 0 and lo >= 0:
+                c = (hi << 4) | lo
+                i += 2
+        out.append(c)
+        i += 1
+    return _decode(out)
+
+
+def parse_form(data):
+    """Parse urlencoded form data (bytes) into a dict of str"""
+    form = {}
+    for field in bytes(data).split(b"&"):
+        if not field:
+            continue
+        name_value = field.split(b"=", 1)
+        value = name_value[1] if len(name_value) > 1 else b""
+        form[unquote_plus(name_value[0])] = unquote_plus(value)
+    return form
+
+
+def escape(s):
+    """Escape &, <, > and " for use in HTML text and attribute values"""
+    return s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+
+
+class Request:
+    """Incremental HTTP/1.0 request parser working on a fixed buffer.
+
+    Data is received directly into free() and announced with feed(n).
+    Request line and headers must fit into the buffer. Once they are
+    parsed, the body is moved to the start of the buffer, so it may use
+    all of it; larger requests raise HTTPError as soon as that is known.
+    """
+
+    def __init__(self, size=1024):
+        self.buf = bytearray(size)
+        self.mv = memoryview(self.buf)
+        self.reset()
+
+    def reset(self):
+        self.n = 0
+        self._match = 0         # matched bytes of b"\r\n\r\n"
+        self.header_end = -1    # start of body
+        self.method = None
+        self.path = None
+        self.query = b""
+        self.content_length = 0
+        self.content_type = None
+        self.done = False
+
+    def free(self):
+        """Return the free part of the buffer to receive into"""
+        if self.n >= len(self.buf):
+            raise HTTPError(431 if self.header_end < 0 else 413)
+        return self.mv[self.n:]
+
+    def feed(self, nbytes):
+        """Account for nbytes received into free(). Returns True when complete"""
+        buf = self.buf
+        start = self.n
+        self.n += nbytes
+        if self.header_end < 0:
+            match = self._match
+            for i in range(start, self.n):
+                c = buf[i]
+                if c == (0x0d if match in (0, 2) else 0x0a):
+                    match += 1
+                    if match == 4:
+                        self.header_end = i + 1
+                        break
+                else:
+                    match = 1 if c == 0x0d else 0
+            self._match = match
+            if self.header_end < 0:
+                if nbytes == 0:
+                    raise HTTPError(400, "incomplete request")
+                return False
+            self._parse_head()
+            # the head is parsed, make the whole buffer available to the body
+            received = self.n - self.header_end
+            if received:
+                buf[:received] = bytes(self.mv[self.header_end:self.n])
+            self.n = received
+            self.header_end = 0
+        elif nbytes == 0:
+            raise HTTPError(400, "incomplete body")
+
+        if self.n >= self.header_end + self.content_length:
+            self.done = True
+        return self.done
+
+    def _parse_head(self):
+        lines = bytes(self.mv[:self.header_end - 4]).split(b"\r\n")
+        parts = lines[0].split(b" ")
+        if len(parts) != 3 or not parts[2].startswith(b"HTTP/"):
+            raise HTTPError(400, "invalid request line")
+        self.method = _decode(parts[0])
+        target = parts[1].split(b"?", 1)
+        self.path = unquote_plus(target[0])
+        if len(target) > 1:
+            self.query = target[1]
+        for line in lines[1:]:
+            name_value = line.split(b":", 1)
+            if len(name_value) != 2:
+                continue
+            name = name_value[0].strip().lower()
+            value = name_value[1]
+            if name == b"content-length":
+                try:
+                    self.content_length = int(value.strip())
+                except ValueError:
+                    raise HTTPError(400, "invalid Content-Length")
+                if self.content_length < 0:
+                    raise HTTPError(400, "invalid Content-Length")
+            elif name == b"content-type":
+                self.content_type = _decode(value.strip())
+        if self.content_length > len(self.buf):
+            raise HTTPError(413)
+
+    def body(self):
+        """Return the request body as memoryview"""
+        return self.mv[self.header_end:self.header_end + self.content_length]
+
+    def form(self):
+        """Return form fields from the body (POST) or the query string"""
+        if self.method == "POST":
+            return parse_form(self.body())
+        return parse_form(self.query)
+
+
+def _recv_into(sock, mv):
+    try:
+        return sock.recv_into(mv)
+    except AttributeError:
+        # no recv_into() on this port
+        data = sock.recv(len(mv))
+        mv[:len(data)] = data
+        return len(data)
+
+
+def read_request(sock, req):
+    """Read a complete request from a blocking socket into req"""
+    req.reset()
+    while not req.feed(_recv_into(sock, req.free())):
+        pass
+    return req
+
+
+async def read_request_async(reader, req):
+    """Read a complete request from an asyncio stream into req"""
+    req.reset()
+    while True:
+        mv = req.free()
+        data = await reader.read(len(mv))
+        mv[:len(data)] = data
+        if req.feed(len(data)):
+            return req
+
+
+class BufferedClient:
+    """Collects everything the handlers send, to write it to an asyncio stream"""
+
+    def __init__(self):
+        self.parts = []
+
+    def sendall(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        # copy, data may be a view of a shared response buffer
+        self.parts.append(bytes(data))
+
+    def close(self):
+        pass
+
+
+def send_error(client, error):
+    """Send a plain text response for an HTTPError"""
+    body = str(error).encode()
+    client.sendall("HTTP/1.0 {} {}\r\nContent-Type: text/plain\r\nContent-Length: {}\r\n"
+                   "Connection: close\r\n\r\n".format(
+                       error.status, STATUS.get(error.status, "Error"), len(body)).encode() + body)
+
+
+def require_asyncio():
+    """Raise ImportError unless uasyncio v3 (MicroPython 1.13 or later) is available"""
+    if asyncio is None:
+        raise ImportError("uasyncio not available")
+    for name in ASYNCIO_API:
+        if not hasattr(asyncio, name):
+            raise ImportError("uasyncio v3 (MicroPython 1.13 or later) required, %s missing" % name)
+
+
+async def handle_stream(reader, writer, req, handler, on_error=send_error, timeout=5):
+    """Serve one request on an asyncio stream.
+
+    The request is read into req (a Request), then await handler(client,
+    req) is run with a BufferedClient, and everything it sent is written
+    to the stream at once. Requests that are not complete after timeout
+    seconds are dropped.
+    """
+    client = BufferedClient()
+    try:
+        try:
+            await asyncio.wait_for(read_request_async(reader, req), timeout)
+            await handler(client, req)
+        except HTTPError as e:
+            on_error(client, e)
+        if client.parts:
+            await writer.awrite(b"".join(client.parts))
+    except (OSError, asyncio.TimeoutError) as e:
+        print("client error", repr(e))
+    finally:
+        await writer.aclose()
@@ -0,0 +1,144 @@
+"""
+i2c_bus.py
+
+Shared I2C buses.
+
+get() returns one Bus per port, created on first use with a
+configurable frequency, so all drivers (AXP192, MPU6886, ...) share the
+same instance instead of every module creating its own I2C object.
+
+A Bus can be used wherever the drivers expect a machine.I2C. It adds
+    lock      asyncio lock, so concurrent tasks do not interleave
+              transactions: async with bus.lock: ...
+    batch()   queue several register operations and execute them back
+              to back
+
+Example:
+    import i2c_bus
+    bus = i2c_bus.get(0, freq=400000)
+    with bus.batch() as b:
+        b.write_byte(0x34, 0x82, 0xff)
+        b.read_into(0x34, 0x78, buf)
+"""
+
+from machine import I2C, Pin
+
+DEFAULT_FREQ = 400000
+
+# default pins (sda, scl) per port; port 0 is the internal bus of the
+# M5StickC with AXP192 and MPU6886
+PINS = {0: (21, 22)}
+
+_buses = {}
+
+
+class Batch:
+    """Register operations queued for execution back to back."""
+
+    def __init__(self, bus):
+        self.bus = bus
+        self.ops = []
+
+    def write(self, addr, reg, data):
+        self.ops.append((False, addr, reg, data))
+        return self
+
+    def write_byte(self, addr, reg, value):
+        return self.write(addr, reg, bytes((value,)))
+
+    def read_into(self, addr, reg, buf):
+        """Read len(buf) bytes from register reg into buf"""
+        self.ops.append((True, addr, reg, buf))
+        return self
+
+    def run(self):
+        """Execute and clear all queued operations"""
+        i2c = self.bus.i2c
+        for read, addr, reg, buf in self.ops:
+            if read:
+                i2c.readfrom_mem_into(addr, reg, buf)
+            else:
+                i2c.writeto_mem(addr, reg, buf)
+        self.ops = []
+
+    async def run_async(self):
+        """Execute all queued operations while holding the bus lock"""
+        async with self.bus.lock:
+            self.run()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.run()
+
+
+class Bus:
+    """A shared I2C bus"""
+
+    def __init__(self, i2c, freq, sda, scl):
+        self.i2c = i2c
+        self.freq = freq
+        self.sda = sda
+        self.scl = scl
+        self._lock = None
+
+    @property
+    def lock(self):
+        if self._lock is None:
+            import uasyncio as asyncio
+            if not hasattr(asyncio, 'Lock'):
+                raise ImportError("uasyncio v3 (MicroPython 1.13 or later) required")
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def batch(self):
+        return Batch(self)
+
+    def scan(self):
+        return self.i2c.scan()
+
+    def readfrom(self, addr, nbytes):
+        return self.i2c.readfrom(addr, nbytes)
+
+    def readfrom_into(self, addr, buf):
+        self.i2c.readfrom_into(addr, buf)
+
+    def writeto(self, addr, buf):
+        return self.i2c.writeto(addr, buf)
+
+    def readfrom_mem(self, addr, reg, nbytes):
+        return self.i2c.readfrom_mem(addr, reg, nbytes)
+
+    def readfrom_mem_into(self, addr, reg, buf):
+        self.i2c.readfrom_mem_into(addr, reg, buf)
+
+    def writeto_mem(self, addr, reg, buf):
+        self.i2c.writeto_mem(addr, reg, buf)
+
+
+def get(port=0, sda=None, scl=None, freq=None):
+    """Return the shared Bus for port, creating it on first use.
+
+    sda/scl default to PINS[port]. freq defaults to DEFAULT_FREQ; passing
+    a different freq for an existing bus reconfigures it. Other pins than
+    those of the existing bus raise ValueError, as the drivers sharing it
+    would lose their devices.
+    """
+    bus = _buses.get(port)
+    if bus is not None:
+        if (sda is not None and sda != bus.sda) or (scl is not None and scl != bus.scl):
+            raise ValueError("I2C port %d already uses sda=%d scl=%d" % (port, bus.sda, bus.scl))
+        if freq is not None and freq != bus.freq:
+            bus.i2c.init(sda=Pin(bus.sda), scl=Pin(bus.scl), freq=freq)
+            bus.freq = freq
+        return bus
+
+    if sda is None or scl is None:
+        sda, scl = PINS[port]
+    if freq is None:
+        freq = DEFAULT_FREQ
+    bus = Bus(I2C(port, sda=Pin(sda), scl=Pin(scl), freq=freq), freq, sda, scl)
+    _buses[port] = bus
+    return bus
@@ -0,0 +1,147 @@
+"""
+m5stickc
+
+High(?) level functions for dealing with M5StickC hardware
+
+Importing this package does not touch the hardware. Every device is
+initialized on first use through its accessor (axp(), imu(), lcd()),
+or explicitly with init() early in the application.
+
+Sensor values should be read through the shared sampler(), which reads
+all requested channels with the fewest I2C transactions.
+
+History:
+    2019-12-27 TW created
+
+"""
+
+from micropython import const
+
+_I2C_PORT = const(0)
+
+_axp = None
+_imu = None
+_lcd = None
+_backlight = None
+_governor = None
+_sampler = None
+
+
+def i2c():
+    """Return the shared internal I2C bus (AXP192, MPU6886)"""
+    import i2c_bus
+    return i2c_bus.get(_I2C_PORT)
+
+
+def axp():
+    """Return the AXP192 power management IC, set up on first use"""
+    global _axp
+    if _axp is None:
+        from axp192 import AXP192
+        _axp = AXP192(i2c())
+        _axp.setup()
+    return _axp
+
+
+def imu():
+    """Return the MPU6886 IMU, initialized on first use"""
+    global _imu
+    if _imu is None:
+        from mpu6886 import MPU6886
+        _imu = MPU6886(i2c())
+    return _imu
+
+
+def lcd():
+    """Return the ST7735 LCD, initialized on first use"""
+    global _lcd
+    if _lcd is None:
+        from m5stickc_lcd import ST7735
+        _lcd = ST7735()
+    return _lcd
+
+
+def lcd_backlight(**kwargs):
+    """Return the backlight brightness and auto-dim policy, created on first use.
+
+    kwargs are passed to backlight.Backlight() on the first call. With
+    imu=..., motion is read from the shared sampler().
+    """
+    global _backlight
+    if _backlight is None:
+        from m5stickc.backlight import Backlight
+        if kwargs.get('imu') is not None and 'sampler' not in kwargs:
+            from m5stickc.sampling import ACCEL
+            kwargs['sampler'] = sampler(ACCEL)
+        _backlight = Backlight(axp(), **kwargs)
+    return _backlight
+
+
+def power_governor(**kwargs):
+    """Return the power governor, created on first use.
+
+    kwargs are passed to governor.Governor() on the first call. The
+    power state is read through the shared sampler().
+    """
+    global _governor
+    if _governor is None:
+        from m5stickc.governor import Governor, CHANNELS
+        if 'sampler' not in kwargs:
+            kwargs['sampler'] = sampler(CHANNELS)
+        _governor = Governor(axp(), **kwargs)
+    return _governor
+
+
+def sampler(channels=None):
+    """Return the shared sampling.Sampler.
+
+    It reads at least the given channels (default: sampling.POWER).
+    Channels not read yet are added to the shared instance with
+    Sampler.add_channels(), so every consumer keeps the same object;
+    its values and ticks arrays are replaced, so look them up on the
+    Sampler rather than keeping them.
+    """
+    global _sampler
+    from m5stickc import sampling
+    if channels is None:
+        if _sampler is not None:
+            return _sampler
+        channels = sampling.POWER
+    devices = [sampling.CHANNELS[name][0] for name in channels]
+    drivers = (axp() if sampling.AXP192_ADDRESS in devices else None,
+               imu() if sampling.MPU6886_ADDRESS in devices else None)
+    if _sampler is None:
+        _sampler = sampling.Sampler(drivers[0], drivers[1], channels)
+    else:
+        _sampler.add_channels(channels, *drivers)
+    return _sampler
+
+
+def init(with_imu=False, with_lcd=False):
+    """Initialize the board: power management, and optionally IMU and LCD"""
+    axp()
+    if with_imu:
+        imu()
+    if with_lcd:
+        lcd()
+
+
+def lcd_backlight_power(status=True):
+    """Turn LCD backlight on or off"""
+
+    # in M5StickC, LCD backlight is wired to AXP192 LD02 output.
+    axp().set_LD02(status)
+
+
+def lcd_brightness(level):
+    """Set LCD backlight brightness, level 7 (dark) .. 12 (default)"""
+
+    axp().set_LD02_level(level)
+
+
+def power_button():
+    """Returns status of the power button"""
+
+    if axp().button():
+        return True
+    return False
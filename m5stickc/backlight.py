@@ -0,0 +1,157 @@
+"""
+backlight.py
+
+LCD backlight brightness and auto-dim/auto-off.
+
+The backlight is powered by the AXP192 LD02 output, brightness is set
+through its voltage (register 0x28, AXP192.set_LD02_level()). The usable
+range on the M5StickC is level 7 (2.5V, barely visible) to 12 (3.0V,
+the default); brightness in percent is mapped onto these steps.
+
+After dim_after_ms without activity the backlight is dimmed, after
+off_after_ms it is turned off. Activity is a press of button A or B
+(GPIO interrupts, no bus traffic), a press of the power key (polled
+through the AXP192, if power_key is set), motion seen by the IMU (if an
+imu or a sampler with the accel channels is given), or a call to
+activity(). Registers are only written when the state changes.
+m5stickc.lcd_backlight(imu=...) takes the acceleration from the shared
+m5stickc.sampler() instead of reading the IMU itself.
+
+Example:
+    import m5stickc
+    bl = m5stickc.lcd_backlight()
+    bl.set_brightness(60)
+    sched.add(bl.poll, 200)
+"""
+
+import time
+
+from machine import Pin
+from micropython import const
+
+MIN_LEVEL = const(7)
+MAX_LEVEL = const(12)
+
+# GPIOs of button A and B, active low
+BUTTONS = (37, 39)
+
+ACTIVE = const(0)
+DIMMED = const(1)
+OFF = const(2)
+
+
+def level(percent):
+    """Return the LD02 level for a brightness in percent, 0 for off"""
+    if percent <= 0:
+        return 0
+    percent = min(100, percent)
+    return MIN_LEVEL + (percent * (MAX_LEVEL - MIN_LEVEL) + 50) // 100
+
+
+class Backlight:
+    """Backlight brightness with inactivity policy.
+
+    axp:             AXP192 instance
+    brightness:      brightness while active, percent
+    dim_brightness:  brightness while dimmed, percent
+    dim_after_ms:    inactivity until dimmed, 0 to never dim
+    off_after_ms:    inactivity until turned off, 0 to never turn off
+    buttons:         GPIOs whose falling edge counts as activity
+    power_key:       poll the AXP192 power key in poll()
+    imu:             MPU6886 instance to detect motion in poll(), or None
+    motion_g:        change of acceleration on any axis counted as motion
+    sampler:         m5stickc Sampler with accel_x/y/z, used instead of imu
+    max_age_ms:      sampler values younger than this are not read again
+    """
+
+    def __init__(self, axp, brightness=100, dim_brightness=10, dim_after_ms=10000,
+                 off_after_ms=30000, buttons=BUTTONS, power_key=False, imu=None,
+                 motion_g=0.15, sampler=None, max_age_ms=100):
+        self.axp = axp
+        self.sampler = sampler
+        self.max_age_ms = max_age_ms
+        self.brightness = brightness
+        self.dim_brightness = dim_brightness
+        self.dim_after_ms = dim_after_ms
+        self.off_after_ms = off_after_ms
+        self.power_key = power_key
+        self.imu = imu
+        self.motion_g = motion_g
+        self.state = None
+        self.last_activity = time.ticks_ms()
+        self._pending = False
+        self._accel = None
+        self._pins = []
+        for gpio in buttons:
+            pin = Pin(gpio, Pin.IN)
+            pin.irq(trigger=Pin.IRQ_FALLING, handler=self._irq)
+            self._pins.append(pin)
+        self._apply(ACTIVE)
+
+    def _irq(self, pin):
+        self._pending = True
+
+    def set_brightness(self, brightness, dim_brightness=None):
+        """Set brightness in percent, applied right away if active"""
+        self.brightness = brightness
+        if dim_brightness is not None:
+            self.dim_brightness = dim_brightness
+        self._apply(self.state, True)
+
+    def activity(self):
+        """Note user activity: restore full brightness and restart the timers"""
+        self.last_activity = time.ticks_ms()
+        self._apply(ACTIVE)
+
+    def _moved(self):
+        s = self.sampler
+        if s is not None:
+            s.latest(self.max_age_ms)
+            accel = (s['accel_x'], s['accel_y'], s['accel_z'])
+        else:
+            accel = self.imu.getAccelData()
+        last = self._accel
+        self._accel = accel
+        if last is None:
+            return False
+        for i in range(3):
+            if abs(accel[i] - last[i]) > self.motion_g:
+                return True
+        return False
+
+    def poll(self):
+        """Check activity sources and update the backlight state"""
+        active = self._pending
+        self._pending = False
+        if self.power_key and self.axp.button():
+            active = True
+        if (self.imu is not None or self.sampler is not None) and self._moved():
+            active = True
+        if active:
+            self.activity()
+            return
+
+        idle = time.ticks_diff(time.ticks_ms(), self.last_activity)
+        if self.off_after_ms and idle >= self.off_after_ms:
+            self._apply(OFF)
+        elif self.dim_after_ms and idle >= self.dim_after_ms:
+            self._apply(DIMMED)
+
+    def _apply(self, state, force=False):
+        if state == self.state and not force:
+            return
+        self.state = state
+        lvl = 0
+        if state == ACTIVE:
+            lvl = level(self.brightness)
+        elif state == DIMMED:
+            lvl = level(self.dim_brightness)
+        if lvl:
+            self.axp.set_LD02_level(lvl)
+        self.axp.set_LD02(lvl > 0)
+
+    def close(self):
+        """Remove the button interrupt handlers"""
+        for pin in self._pins:
+            pin.irq(handler=None)
+        self._pins = []
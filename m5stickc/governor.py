@@ -0,0 +1,165 @@
+"""
+governor.py
+
+Power governor: switches between a performance and an economy profile
+depending on the power state read from the AXP192.
+
+    performance  on USB (VBUS present) and the AXP192 is not too hot
+    economy      on battery, or above max_temperature
+
+A profile sets the CPU frequency (machine.freq()) and a scale factor
+for periodic work. Components register a callback to scale down when
+the profile changes (display refresh rate, IMU sample rate, WiFi
+keep-alive, ...); Scheduler tasks registered with scale_task() get
+their period multiplied by the scale factor. On battery, battery_low
+is set when the warning level is reached or the voltage drops below
+low_voltage, so components can cut down even further.
+
+With a sampler the power state is taken from its latest sample (the
+CHANNELS below) instead of four separate AXP192 reads;
+m5stickc.power_governor() uses the shared m5stickc.sampler().
+
+Example:
+    import m5stickc
+    from m5stickc.governor import PERFORMANCE
+    gov = m5stickc.power_governor()
+    gov.scale_task(sched.add(update_display, 100), 100)
+    gov.register(lambda g: imu.setReg(0x19, 5 if g.profile is PERFORMANCE else 39))
+    sched.add(gov.poll, 5000)
+"""
+
+import machine
+
+# sampler channels read by poll()
+CHANNELS = ('vbus_present', 'temperature', 'battery_voltage', 'warning_level')
+
+
+class Profile:
+    """freq: CPU frequency in Hz, scale: multiplier for task periods"""
+
+    def __init__(self, name, freq, scale):
+        self.name = name
+        self.freq = freq
+        self.scale = scale
+
+    def __repr__(self):
+        return "Profile(%s, %d MHz, x%d)" % (self.name, self.freq // 1000000, self.scale)
+
+
+PERFORMANCE = Profile("performance", 240000000, 1)
+ECONOMY = Profile("economy", 80000000, 4)
+
+
+class Governor:
+    """Selects the profile from the AXP192 power state.
+
+    axp:              AXP192 instance
+    low_voltage:      battery voltage below which battery_low is set (V)
+    max_temperature:  AXP192 temperature above which economy is used (°C)
+    set_freq:         change machine.freq() with the profile
+    sampler:          m5stickc Sampler with CHANNELS, or None to read the axp
+    max_age_ms:       sampler values younger than this are not read again
+    """
+
+    # hysteresis when leaving the low battery / hot state
+    VOLTAGE_HYSTERESIS = 0.1
+    TEMPERATURE_HYSTERESIS = 5.0
+
+    def __init__(self, axp, low_voltage=3.5, max_temperature=65.0, set_freq=True,
+                 performance=PERFORMANCE, economy=ECONOMY, sampler=None, max_age_ms=1000):
+        self.axp = axp
+        self.sampler = sampler
+        self.max_age_ms = max_age_ms
+        self.low_voltage = low_voltage
+        self.max_temperature = max_temperature
+        self.set_freq = set_freq
+        self.performance = performance
+        self.economy = economy
+        self.profile = None
+        self.vbus = None
+        self.battery_voltage = None
+        self.battery_low = False
+        self.temperature = None
+        self.hot = False
+        self.changes = 0
+        self._callbacks = []
+        self._tasks = []
+
+    def register(self, callback):
+        """Call callback(governor) whenever the profile or battery_low changes"""
+        self._callbacks.append(callback)
+        if self.profile is not None:
+            callback(self)
+
+    def unregister(self, callback):
+        self._callbacks.remove(callback)
+
+    def scale_task(self, task, period_ms):
+        """Run a Scheduler task every period_ms * profile scale"""
+        self._tasks.append((task, period_ms))
+        if self.profile is not None:
+            task.period_us = int(period_ms * self.profile.scale * 1000)
+        return task
+
+    def period_ms(self, period_ms):
+        """Return period_ms scaled for the current profile"""
+        if self.profile is None:
+            return period_ms
+        return period_ms * self.profile.scale
+
+    def poll(self):
+        """Read the power state and switch the profile if needed.
+
+        Returns the current profile.
+        """
+        s = self.sampler
+        if s is not None:
+            s.latest(self.max_age_ms)
+        read = self._read
+        self.vbus = bool(read('vbus_present'))
+        self.temperature = read('temperature')
+        if self.hot:
+            self.hot = self.temperature > self.max_temperature - self.TEMPERATURE_HYSTERESIS
+        else:
+            self.hot = self.temperature > self.max_temperature
+
+        battery_low = False
+        if not self.vbus:
+            self.battery_voltage = read('battery_voltage')
+            threshold = self.low_voltage
+            if self.battery_low:
+                threshold += self.VOLTAGE_HYSTERESIS
+            battery_low = self.battery_voltage < threshold or bool(read('warning_level'))
+
+        profile = self.performance if self.vbus and not self.hot else self.economy
+        if profile is not self.profile or battery_low != self.battery_low:
+            self.battery_low = battery_low
+            self._apply(profile)
+        return self.profile
+
+    def _read(self, name):
+        if self.sampler is None:
+            return getattr(self.axp, name)()
+        return self.sampler[name]
+
+    def _apply(self, profile):
+        if profile is not self.profile:
+            self.profile = profile
+            self.changes += 1
+            if self.set_freq and machine.freq() != profile.freq:
+                machine.freq(profile.freq)
+            for task, period_ms in self._tasks:
+                task.period_us = int(period_ms * profile.scale * 1000)
+        for callback in self._callbacks:
+            callback(self)
+
+    def stats(self):
+        return {
+            "profile": self.profile.name if self.profile else None,
+            "vbus": self.vbus,
+            "battery_voltage": self.battery_voltage,
+            "battery_low": self.battery_low,
+            "temperature": self.temperature,
+            "freq": machine.freq(),
+            "changes": self.changes,
+        }
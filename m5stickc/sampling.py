@@ -0,0 +1,218 @@
+"""
+sampling.py
+
+Time aligned sampling of AXP192 and MPU6886 channels.
+
+A Sampler is created for a set of channel names. It plans the fewest
+burst reads covering the registers of all channels (e.g. accel,
+temperature and gyro are one 14 byte read; battery voltage, current and
+APS voltage one 8 byte read), and every sample() runs exactly these
+reads into preallocated buffers. Each read is stamped with ticks_us,
+the decoded values go into a reused array('f').
+
+Consumers (display, logger, metrics, network) should share one Sampler
+and call latest(max_age_ms), which only reads the hardware if the last
+sample is older than that, instead of polling the drivers themselves.
+
+Example:
+    import m5stickc
+    s = m5stickc.sampler(('accel_x', 'accel_y', 'accel_z', 'battery_voltage'))
+    s.sample()
+    s['battery_voltage'], s.values, s.ticks
+"""
+
+import time
+from array import array
+
+AXP192_ADDRESS = 0x34
+MPU6886_ADDRESS = 0x68
+
+# reads with at most this many unused bytes in between are merged
+MAX_GAP = 4
+
+# decoders
+_U12 = 0        # 12 bit ADC value, high 8 bits first
+_I13 = 1        # 13 bit charge current minus 13 bit discharge current
+_U24 = 2
+_BIT = 3        # single bit, scale is the mask
+_S16 = 4        # signed 16 bit big endian
+_ACCEL = 5      # _S16 scaled with imu.aRes
+_GYRO = 6       # _S16 scaled with imu.gRes
+
+# name: (device, register, nbytes, decoder, scale, offset)
+# scales and offsets as in axp192.py and mpu6886.py
+CHANNELS = {
+    'vbus_present': (AXP192_ADDRESS, 0x00, 1, _BIT, 0x20, 0),
+    'warning_level': (AXP192_ADDRESS, 0x47, 1, _BIT, 0x01, 0),
+    'input_voltage': (AXP192_ADDRESS, 0x56, 2, _U12, 1.7e-3, 0),
+    'input_current': (AXP192_ADDRESS, 0x58, 2, _U12, 0.625, 0),
+    'bus_voltage': (AXP192_ADDRESS, 0x5a, 2, _U12, 1.7e-3, 0),
+    'bus_current': (AXP192_ADDRESS, 0x5c, 2, _U12, 0.375, 0),
+    'temperature': (AXP192_ADDRESS, 0x5e, 2, _U12, 0.1, -144.7),
+    'battery_power': (AXP192_ADDRESS, 0x70, 3, _U24, 1.1 * 0.5, 0),
+    'battery_voltage': (AXP192_ADDRESS, 0x78, 2, _U12, 1.1e-3, 0),
+    'battery_charge_current': (AXP192_ADDRESS, 0x7a, 2, _U12, 0.5, 0),
+    'battery_current': (AXP192_ADDRESS, 0x7a, 4, _I13, 0.5, 0),
+    'aps_voltage': (AXP192_ADDRESS, 0x7e, 2, _U12, 1.4e-3, 0),
+    'accel_x': (MPU6886_ADDRESS, 0x3b, 2, _ACCEL, 1, 0),
+    'accel_y': (MPU6886_ADDRESS, 0x3d, 2, _ACCEL, 1, 0),
+    'accel_z': (MPU6886_ADDRESS, 0x3f, 2, _ACCEL, 1, 0),
+    'imu_temperature': (MPU6886_ADDRESS, 0x41, 2, _S16, 1 / 326.8, 25.0),
+    'gyro_x': (MPU6886_ADDRESS, 0x43, 2, _GYRO, 1, 0),
+    'gyro_y': (MPU6886_ADDRESS, 0x45, 2, _GYRO, 1, 0),
+    'gyro_z': (MPU6886_ADDRESS, 0x47, 2, _GYRO, 1, 0),
+}
+
+ACCEL = ('accel_x', 'accel_y', 'accel_z')
+GYRO = ('gyro_x', 'gyro_y', 'gyro_z')
+IMU = ACCEL + ('imu_temperature',) + GYRO
+POWER = ('battery_voltage', 'battery_current', 'battery_charge_current', 'bus_voltage',
+         'bus_current', 'aps_voltage', 'temperature', 'warning_level')
+
+
+def plan(channels, max_gap=MAX_GAP):
+    """Return the burst reads [(device, register, nbytes), ...] covering all channels"""
+    ranges = sorted((CHANNELS[name][0], CHANNELS[name][1], CHANNELS[name][1] + CHANNELS[name][2])
+                    for name in channels)
+    reads = []
+    for dev, start, end in ranges:
+        if reads:
+            last = reads[-1]
+            if last[0] == dev and start <= last[2] + max_gap:
+                if end > last[2]:
+                    last[2] = end
+                continue
+        reads.append([dev, start, end])
+    return [(dev, start, end - start) for dev, start, end in reads]
+
+
+class Sampler:
+    """Reads a fixed set of channels with the fewest I2C transactions.
+
+    axp, imu:  AXP192 / MPU6886 instances, only needed if channels of
+               that device are requested
+    channels:  channel names, see CHANNELS
+
+    After sample():
+        values  array('f'), one value per channel, in channel order
+        ticks   array('i'), ticks_us when the read of each channel started
+        t_us    ticks_us at the start of the sample
+    """
+
+    def __init__(self, axp=None, imu=None, channels=POWER, max_gap=MAX_GAP):
+        self.axp = axp
+        self.imu = imu
+        self.max_gap = max_gap
+        self.samples = 0
+        self._build(tuple(channels))
+
+    def _build(self, channels):
+        reads = plan(channels, self.max_gap)
+        _reads = []
+        for dev, reg, nbytes in reads:
+            owner = self.axp if dev == AXP192_ADDRESS else self.imu
+            if owner is None:
+                raise ValueError("no driver for device 0x%02x" % dev)
+            _reads.append((owner.i2c, dev, reg, bytearray(nbytes)))
+        self._reads = _reads
+
+        # per channel: (read index, offset in its buffer, decoder, scale, offset)
+        self._decode = []
+        for name in channels:
+            dev, reg, nbytes, decoder, scale, offset = CHANNELS[name]
+            for i, (_, rdev, rreg, buf) in enumerate(_reads):
+                if rdev == dev and rreg <= reg and reg + nbytes <= rreg + len(buf):
+                    self._decode.append((i, reg - rreg, decoder, scale, offset))
+                    break
+        self.read_ticks = array('i', [0] * len(_reads))
+
+        self.channels = channels
+        self.index = {name: i for i, name in enumerate(channels)}
+        self.values = array('f', [0] * len(channels))
+        self.ticks = array('i', [0] * len(channels))
+        self.t_us = None
+
+    def add_channels(self, channels, axp=None, imu=None):
+        """Also read channels from now on, the Sampler stays the same object.
+
+        New channels are appended, existing ones keep their index. The
+        reads are planned again and values / ticks are replaced by new
+        arrays; the next latest() samples. axp and imu supply drivers for
+        devices that had none. Returns the number of channels added.
+        """
+        missing = tuple(name for name in channels if name not in self.index)
+        if not missing:
+            return 0
+        old_axp, old_imu = self.axp, self.imu
+        if axp is not None:
+            self.axp = axp
+        if imu is not None:
+            self.imu = imu
+        try:
+            self._build(self.channels + missing)
+        except (KeyError, ValueError):
+            self.axp, self.imu = old_axp, old_imu
+            raise
+        return len(missing)
+
+    @property
+    def transactions(self):
+        """Number of I2C reads per sample"""
+        return len(self._reads)
+
+    def sample(self):
+        """Read all channels now, returns the values array"""
+        read_ticks = self.read_ticks
+        for i, (i2c, dev, reg, buf) in enumerate(self._reads):
+            read_ticks[i] = time.ticks_us()
+            i2c.readfrom_mem_into(dev, reg, buf)
+        self.t_us = read_ticks[0] if self._reads else time.ticks_us()
+
+        values = self.values
+        ticks = self.ticks
+        reads = self._reads
+        for c, (i, o, decoder, scale, offset) in enumerate(self._decode):
+            b = reads[i][3]
+            if decoder == _U12:
+                v = (b[o] << 4) | b[o + 1]
+            elif decoder == _I13:
+                v = ((b[o] << 5) | b[o + 1]) - ((b[o + 2] << 5) | b[o + 3])
+            elif decoder == _BIT:
+                v = 1 if b[o] & scale else 0
+                scale = 1
+            elif decoder == _U24:
+                v = (b[o] << 16) | (b[o + 1] << 8) | b[o + 2]
+            else:
+                v = (b[o] << 8) | b[o + 1]
+                if v & 0x8000:
+                    v -= 0x10000
+                if decoder == _ACCEL:
+                    scale = self.imu.aRes
+                elif decoder == _GYRO:
+                    scale = self.imu.gRes
+            values[c] = v * scale + offset
+            ticks[c] = read_ticks[i]
+        self.samples += 1
+        return values
+
+    def latest(self, max_age_ms=0):
+        """Return the values, sampling only if they are older than max_age_ms"""
+        if self.t_us is None or self.age_us() > max_age_ms * 1000:
+            self.sample()
+        return self.values
+
+    def age_us(self):
+        """Return µs since the last sample, or None"""
+        if self.t_us is None:
+            return None
+        return time.ticks_diff(time.ticks_us(), self.t_us)
+
+    def __getitem__(self, name):
+        return self.values[self.index[name]]
+
+    def get(self, name, default=None):
+        i = self.index.get(name)
+        return default if i is None else self.values[i]
+
+    def as_dict(self):
+        return {name: self.values[i] for i, name in enumerate(self.channels)}
@@ -1,7 +1,6 @@
 import framebuf
 import time
-from machine import Pin, SPI, I2C
-from axp192 import AXP192
+from machine import Pin, SPI
 
 '''
 import m5stickc_lcd
@@ -38,10 +37,9 @@ class ST7735(framebuf.FrameBuffer):
         self.init_display()
 
     def enable_lcd_power(self):
-        i2c = I2C(0, sda=Pin(21), scl=Pin(22))
-        axp = AXP192(i2c)
-        axp.setup()
-        axp.set_LD02(True)
+        # the AXP192 is set up once, on the shared bus, by m5stickc
+        from m5stickc import axp
+        axp().set_LD02(True)
 
     def init_display(self):
         for cmd, data, delay in [
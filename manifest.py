@@ -0,0 +1,28 @@
+# Freeze the board support into the firmware as .mpy (folded consts, no
+# compilation and less heap use at import). Build with
+#   make BOARD=GENERIC FROZEN_MANIFEST=/path/to/manifest.py
+# from ports/esp32 of the MicroPython source tree. FROZEN_MANIFEST replaces
+# the board manifest, so include it to keep _boot.py, inisetup.py etc.
+
+include("$(PORT_DIR)/boards/manifest.py")
+
+freeze('.', (
+    'axp192.py',
+    'mpu6886.py',
+    'm5stickc_lcd.py',
+    'i2c_bus.py',
+    'neomatrix.py',
+    'scheduler.py',
+    'httpd.py',
+    'wifi_connect.py',
+    'wifi_profiles.py',
+    'wifi_manager.py',
+    'metrics.py',
+    'datalog.py',
+))
+freeze('.', (
+    'm5stickc/__init__.py',
+    'm5stickc/backlight.py',
+    'm5stickc/governor.py',
+    'm5stickc/sampling.py',
+))
@@ -0,0 +1,175 @@
+"""
+metrics.py
+
+Device health endpoint.
+
+Metrics (AXP192 ADC values, IMU readings, scheduler timing, free heap,
+WiFi RSSI) are collected by sample(), which should run periodically,
+e.g. as a Scheduler task or via sample_task(). The HTTP server only
+formats the cached snapshot, so a scrape never causes I2C transactions
+of its own and does not disturb the sampling. With a sampler, sensor
+values are taken from the shared m5stickc.sampler() instead of
+separate driver calls.
+
+    GET /metrics        plain text, one "name value" per line
+    GET /metrics.json   JSON object
+
+Example:
+    import uasyncio as asyncio
+    import m5stickc
+    from metrics import Metrics
+    m = Metrics(sampler=m5stickc.sampler(), wlan=wifi_manager.wlan_sta)
+    asyncio.create_task(m.sample_task(5000))
+    asyncio.run(m.serve(8080))
+"""
+
+import gc
+import json
+import time
+
+import httpd
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    asyncio = None
+
+
+AXP_METRICS = (
+    ("battery_voltage", "battery_voltage"),
+    ("battery_current", "battery_current"),
+    ("battery_charge_current", "battery_charge_current"),
+    ("bus_voltage", "bus_voltage"),
+    ("bus_current", "bus_current"),
+    ("aps_voltage", "aps_voltage"),
+    ("axp_temperature", "temperature"),
+    ("warning_level", "warning_level"),
+)
+
+# sampler channels exported under a different name
+SAMPLER_NAMES = {"temperature": "axp_temperature"}
+
+
+class Metrics:
+    """Cached metrics snapshot and HTTP endpoint.
+
+    axp:        AXP192 instance or None
+    imu:        MPU6886 instance or None
+    wlan:       WLAN(STA_IF) instance or None
+    scheduler:  Scheduler instance or None, for loop timing
+    sampler:    m5stickc Sampler instance or None, used instead of axp
+                and imu
+    max_age_ms: sampler values younger than this are not read again
+    """
+
+    def __init__(self, axp=None, imu=None, wlan=None, scheduler=None, sampler=None,
+                 max_age_ms=1000):
+        self.axp = axp
+        self.imu = imu
+        self.wlan = wlan
+        self.scheduler = scheduler
+        self.sampler = sampler
+        self.max_age_ms = max_age_ms
+        self.values = {}
+        self.samples = 0
+        self.sample_ms = None       # ticks_ms of last sample
+        self.sample_us = 0          # duration of last sample
+        self.request = httpd.Request(512)
+        self.response = httpd.Response(1024)
+        self._lock = None
+
+    def sample(self):
+        """Collect a new snapshot"""
+        start = time.ticks_us()
+        v = self.values
+
+        if self.sampler is not None:
+            values = self.sampler.latest(self.max_age_ms)
+            for i, name in enumerate(self.sampler.channels):
+                v[SAMPLER_NAMES.get(name, name)] = values[i]
+
+        elif self.axp is not None:
+            for name, method in AXP_METRICS:
+                v[name] = getattr(self.axp, method)()
+
+        if self.sampler is None and self.imu is not None:
+            v["accel_x"], v["accel_y"], v["accel_z"] = self.imu.getAccelData()
+            v["gyro_x"], v["gyro_y"], v["gyro_z"] = self.imu.getGyroData()
+            v["imu_temperature"] = self.imu.getTempData()
+
+        v["mem_free"] = gc.mem_free()
+        v["mem_alloc"] = gc.mem_alloc()
+
+        if self.wlan is not None:
+            connected = self.wlan.isconnected()
+            v["wifi_connected"] = connected
+            try:
+                v["wifi_rssi"] = self.wlan.status("rssi") if connected else None
+            except (OSError, ValueError, TypeError):
+                v["wifi_rssi"] = None
+
+        if self.scheduler is not None:
+            v["loop_load"] = self.scheduler.load()
+            for s in self.scheduler.stats():
+                prefix = "task_" + s["name"] + "_"
+                for key in ("runs", "missed", "shed", "exec_max_us", "late_max_us"):
+                    v[prefix + key] = s[key]
+
+        self.samples += 1
+        self.sample_ms = time.ticks_ms()
+        self.sample_us = time.ticks_diff(time.ticks_us(), start)
+
+    def snapshot(self):
+        """Return the cached values plus sample information"""
+        d = dict(self.values)
+        d["samples"] = self.samples
+        d["sample_us"] = self.sample_us
+        d["sample_age_ms"] = None if self.sample_ms is None else \
+            time.ticks_diff(time.ticks_ms(), self.sample_ms)
+        return d
+
+    def text(self, resp):
+        """Write the snapshot as text to an httpd.Response"""
+        for name, value in self.snapshot().items():
+            if value is None:
+                continue
+            if isinstance(value, bool):
+                value = int(value)
+            resp.write("{} {}\n".format(name, value))
+
+    async def sample_task(self, period_ms=5000):
+        """Sample every period_ms"""
+        while True:
+            self.sample()
+            await asyncio.sleep_ms(period_ms)
+
+    async def handle(self, client, request):
+        resp = self.response
+        resp.begin()
+        path = request.path.strip("/")
+        if path == "metrics":
+            self.text(resp)
+            resp.send(client, 200, "text/plain")
+        elif path == "metrics.json":
+            resp.write(json.dumps(self.snapshot()))
+            resp.send(client, 200, "application/json")
+        else:
+            resp.write("Path not found: {}".format(path))
+            resp.send(client, 404, "text/plain")
+
+    async def serve_client(self, reader, writer):
+        # one request buffer, scrapes are served one after another
+        async with self._lock:
+            await httpd.handle_stream(reader, writer, self.request, self.handle)
+
+    async def serve(self, port=8080):
+        """Run the HTTP server until the task is cancelled"""
+        httpd.require_asyncio()
+        self._lock = asyncio.Lock()
+        server = await asyncio.start_server(self.serve_client, '0.0.0.0', port, backlog=2)
+        try:
+            while True:
+                await asyncio.sleep_ms(1000)
+        finally:
+            server.close()
+            await server.wait_closed()
@@ -2,40 +2,40 @@
 # MicroPython library for the MPU6886 imu ( M5StickC / ATOM Matrix ) 
 # Based on https://github.com/m5stack/M5StickC/blob/master/src/utility/MPU6886.cpp
 
-from machine import I2C
+from micropython import const
 from time import sleep
 
-MPU6886_ADDRESS           = const(0x68)
-MPU6886_WHOAMI            = const(0x75)
-MPU6886_ACCEL_INTEL_CTRL  = const(0x69)
-MPU6886_SMPLRT_DIV        = const(0x19)
-MPU6886_INT_PIN_CFG       = const(0x37)
-MPU6886_INT_ENABLE        = const(0x38)
-MPU6886_ACCEL_XOUT_H      = const(0x3B)
-MPU6886_ACCEL_XOUT_L      = const(0x3C)
-MPU6886_ACCEL_YOUT_H      = const(0x3D)
-MPU6886_ACCEL_YOUT_L      = const(0x3E)
-MPU6886_ACCEL_ZOUT_H      = const(0x3F)
-MPU6886_ACCEL_ZOUT_L      = const(0x40)
-
-MPU6886_TEMP_OUT_H        = const(0x41)
-MPU6886_TEMP_OUT_L        = const(0x42)
-
-MPU6886_GYRO_XOUT_H       = const(0x43)
-MPU6886_GYRO_XOUT_L       = const(0x44)
-MPU6886_GYRO_YOUT_H       = const(0x45)
-MPU6886_GYRO_YOUT_L       = const(0x46)
-MPU6886_GYRO_ZOUT_H       = const(0x47)
-MPU6886_GYRO_ZOUT_L       = const(0x48)
-
-MPU6886_USER_CTRL         = const(0x6A)
-MPU6886_PWR_MGMT_1        = const(0x6B)
-MPU6886_PWR_MGMT_2        = const(0x6C)
-MPU6886_CONFIG            = const(0x1A)
-MPU6886_GYRO_CONFIG       = const(0x1B)
-MPU6886_ACCEL_CONFIG      = const(0x1C)
-MPU6886_ACCEL_CONFIG2     = const(0x1D)
-MPU6886_FIFO_EN           = const(0x23)
+_MPU6886_ADDRESS           = const(0x68)
+_MPU6886_WHOAMI            = const(0x75)
+_MPU6886_ACCEL_INTEL_CTRL  = const(0x69)
+_MPU6886_SMPLRT_DIV        = const(0x19)
+_MPU6886_INT_PIN_CFG       = const(0x37)
+_MPU6886_INT_ENABLE        = const(0x38)
+_MPU6886_ACCEL_XOUT_H      = const(0x3B)
+_MPU6886_ACCEL_XOUT_L      = const(0x3C)
+_MPU6886_ACCEL_YOUT_H      = const(0x3D)
+_MPU6886_ACCEL_YOUT_L      = const(0x3E)
+_MPU6886_ACCEL_ZOUT_H      = const(0x3F)
+_MPU6886_ACCEL_ZOUT_L      = const(0x40)
+
+_MPU6886_TEMP_OUT_H        = const(0x41)
+_MPU6886_TEMP_OUT_L        = const(0x42)
+
+_MPU6886_GYRO_XOUT_H       = const(0x43)
+_MPU6886_GYRO_XOUT_L       = const(0x44)
+_MPU6886_GYRO_YOUT_H       = const(0x45)
+_MPU6886_GYRO_YOUT_L       = const(0x46)
+_MPU6886_GYRO_ZOUT_H       = const(0x47)
+_MPU6886_GYRO_ZOUT_L       = const(0x48)
+
+_MPU6886_USER_CTRL         = const(0x6A)
+_MPU6886_PWR_MGMT_1        = const(0x6B)
+_MPU6886_PWR_MGMT_2        = const(0x6C)
+_MPU6886_CONFIG            = const(0x1A)
+_MPU6886_GYRO_CONFIG       = const(0x1B)
+_MPU6886_ACCEL_CONFIG      = const(0x1C)
+_MPU6886_ACCEL_CONFIG2     = const(0x1D)
+_MPU6886_FIFO_EN           = const(0x23)
 
 #consts for Acceleration & Resolution scale
 AFS_2G      = const(0x00)
@@ -64,63 +64,63 @@ class MPU6886():
     
     # set I2C reg (1 byte)
     def	setReg(self, reg, dat):
-        self.i2c.writeto(MPU6886_ADDRESS, bytearray([reg, dat]))
+        self.i2c.writeto(_MPU6886_ADDRESS, bytearray([reg, dat]))
 		
     # get I2C reg (1 byte)
     def	getReg(self, reg):
-        self.i2c.writeto(MPU6886_ADDRESS, bytearray([reg]))
-        t =	self.i2c.readfrom(MPU6886_ADDRESS, 1)
+        self.i2c.writeto(_MPU6886_ADDRESS, bytearray([reg]))
+        t =	self.i2c.readfrom(_MPU6886_ADDRESS, 1)
         return t[0]
 
     # get n reg
     def	getnReg(self, reg, n):
-        self.i2c.writeto(MPU6886_ADDRESS, bytearray([reg]))
-        t =	self.i2c.readfrom(MPU6886_ADDRESS, n)
+        self.i2c.writeto(_MPU6886_ADDRESS, bytearray([reg]))
+        t =	self.i2c.readfrom(_MPU6886_ADDRESS, n)
         return t    
 
     def init(self):
-        tempdata = self.getReg(MPU6886_WHOAMI)
+        tempdata = self.getReg(_MPU6886_WHOAMI)
         if tempdata != 0x19:
             return False
         self.sleepms(1)
         regdata = 0x00
-        self.setReg(MPU6886_PWR_MGMT_1, regdata)
+        self.setReg(_MPU6886_PWR_MGMT_1, regdata)
         self.sleepms(10)      
         regdata = (0x01<<7)
-        self.setReg(MPU6886_PWR_MGMT_1, regdata)
+        self.setReg(_MPU6886_PWR_MGMT_1, regdata)
         self.sleepms(10)
         regdata = (0x01<<0)
-        self.setReg(MPU6886_PWR_MGMT_1, regdata)
+        self.setReg(_MPU6886_PWR_MGMT_1, regdata)
         self.sleepms(10)
         regdata = 0x10
-        self.setReg(MPU6886_ACCEL_CONFIG, regdata)
+        self.setReg(_MPU6886_ACCEL_CONFIG, regdata)
         self.sleepms(1)
         regdata = 0x18
-        self.setReg(MPU6886_GYRO_CONFIG, regdata)
+        self.setReg(_MPU6886_GYRO_CONFIG, regdata)
         self.sleepms(1)
         regdata = 0x01
-        self.setReg(MPU6886_CONFIG, regdata)
+        self.setReg(_MPU6886_CONFIG, regdata)
         self.sleepms(1)
         regdata = 0x05
-        self.setReg(MPU6886_SMPLRT_DIV, regdata)
+        self.setReg(_MPU6886_SMPLRT_DIV, regdata)
         self.sleepms(1)
         regdata = 0x00
-        self.setReg(MPU6886_INT_ENABLE, regdata)
+        self.setReg(_MPU6886_INT_ENABLE, regdata)
         self.sleepms(1)
         regdata = 0x00
-        self.setReg(MPU6886_ACCEL_CONFIG2, regdata)
+        self.setReg(_MPU6886_ACCEL_CONFIG2, regdata)
         self.sleepms(1)
         regdata = 0x00
-        self.setReg(MPU6886_USER_CTRL, regdata)
+        self.setReg(_MPU6886_USER_CTRL, regdata)
         self.sleepms(1)
         regdata = 0x00
-        self.setReg(MPU6886_FIFO_EN, regdata)
+        self.setReg(_MPU6886_FIFO_EN, regdata)
         self.sleepms(1)
         regdata = 0x22
-        self.setReg(MPU6886_INT_PIN_CFG, regdata)
+        self.setReg(_MPU6886_INT_PIN_CFG, regdata)
         self.sleepms(1)
         regdata = 0x01
-        self.setReg(MPU6886_INT_ENABLE, regdata)
+        self.setReg(_MPU6886_INT_ENABLE, regdata)
         self.sleepms(100)
         self.getGres()
         self.getAres()
@@ -151,7 +151,7 @@ class MPU6886():
             self.aRes = 2.0/32768.0
 
     def getAccelAdc(self):
-        buf = self.getnReg(MPU6886_ACCEL_XOUT_H,6)
+        buf = self.getnReg(_MPU6886_ACCEL_XOUT_H,6)
                    
         ax = (buf[0]<<8) | buf[1]
         ay = (buf[2]<<8) | buf[3]
@@ -172,7 +172,7 @@ class MPU6886():
         return ax,ay,az
 
     def getGyroAdc(self):
-        buf = self.getnReg(MPU6886_GYRO_XOUT_H,6)
+        buf = self.getnReg(_MPU6886_GYRO_XOUT_H,6)
         gx = (buf[0]<<8) | buf[1]  
         gy = (buf[2]<<8) | buf[3]  
         gz = (buf[4]<<8) | buf[5]
@@ -192,7 +192,7 @@ class MPU6886():
         return gx, gy, gz 
 
     def getTempAdc(self):
-        buf = self.getnReg(MPU6886_TEMP_OUT_H,2)
+        buf = self.getnReg(_MPU6886_TEMP_OUT_H,2)
         return (buf[0]<<8) | buf[1]  
 
     def getTempData(self):
@@ -200,14 +200,14 @@ class MPU6886():
 
     def setGyroFsr(self,scale):
         regdata = (scale<<3)
-        self.setReg(MPU6886_GYRO_CONFIG, regdata)
+        self.setReg(_MPU6886_GYRO_CONFIG, regdata)
         self.sleepms(10)
         self.Gscale = scale
         self.getGres()
 
     def setAccelFsr(self,scale):
         regdata = (scale<<3)
-        self.setReg(MPU6886_ACCEL_CONFIG, regdata)
+        self.setReg(_MPU6886_ACCEL_CONFIG, regdata)
         self.sleepms(10)
         self.Ascale = scale
         self.getAres()
\ No newline at end of file
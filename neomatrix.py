@@ -0,0 +1,113 @@
+"""
+neomatrix.py
+
+framebuf drawing surface for NeoPixel LED matrices, e.g. the 18x7
+NeoFlash hat on the M5StickC or the 5x5 matrix of the ATOM Matrix.
+
+Everything is drawn into an RGB565 FrameBuffer, so framebuf.text(),
+blit(), scroll() etc. can be used for tickers and animations. show()
+converts the frame to the NeoPixel byte order in a single pass, using
+precomputed gamma / global brightness lookup tables, and writes it out.
+
+Example:
+    from neomatrix import NeoMatrix, rgb565
+    m = NeoMatrix(26, 18, 7, brightness=20)
+    m.text('Hi', 0, 0, rgb565(255, 0, 0))
+    m.show()
+"""
+
+import framebuf
+import micropython
+from array import array
+from machine import Pin
+from neopixel import NeoPixel
+
+
+def rgb565(r, g, b):
+    """Return the RGB565 color value for 8 bit r, g, b components"""
+    return ((r & 0xf8) << 8) | ((g & 0xfc) << 3) | (b >> 3)
+
+
+def _make_lut(nbits, gamma, brightness):
+    """Map an nbits wide color component to a gamma corrected LED value"""
+    top = (1 << nbits) - 1
+    lut = bytearray(top + 1)
+    for i in range(top + 1):
+        lut[i] = int(brightness * (i / top) ** gamma + 0.5)
+    return lut
+
+
+class NeoMatrix(framebuf.FrameBuffer):
+    """RGB565 FrameBuffer backed by a NeoPixel matrix.
+
+    pin:        GPIO number (or Pin) the LED data line is connected to
+    width:      number of LEDs per row
+    height:     number of rows
+    brightness: global brightness, 0..255
+    gamma:      gamma correction exponent, 1.0 disables correction
+    serpentine: True if every other row is wired right-to-left
+    """
+
+    def __init__(self, pin, width, height, brightness=32, gamma=2.2,
+                 serpentine=False):
+        if not isinstance(pin, Pin):
+            pin = Pin(pin)
+        self.width = width
+        self.height = height
+        self.np = NeoPixel(pin, width * height)
+        self.buffer = bytearray(width * height * 2)
+        super().__init__(self.buffer, width, height, framebuf.RGB565)
+
+        # byte offset of every frame pixel in the NeoPixel buffer
+        bpp = self.np.bpp
+        self._offsets = array('H', [0] * (width * height))
+        for y in range(height):
+            for x in range(width):
+                if serpentine and (y & 1):
+                    led = y * width + (width - 1 - x)
+                else:
+                    led = y * width + x
+                self._offsets[y * width + x] = led * bpp
+
+        self.gamma = gamma
+        self.brightness = brightness
+        self._build_luts()
+
+    def _build_luts(self):
+        self._lut_r = _make_lut(5, self.gamma, self.brightness)
+        self._lut_g = _make_lut(6, self.gamma, self.brightness)
+        self._lut_b = self._lut_r
+
+    def set_brightness(self, brightness):
+        """Set global brightness (0..255). Takes effect on next show()"""
+        self.brightness = max(0, min(255, brightness))
+        self._build_luts()
+
+    def set_gamma(self, gamma):
+        """Set gamma correction exponent. Takes effect on next show()"""
+        self.gamma = gamma
+        self._build_luts()
+
+    @micropython.native
+    def _convert(self):
+        fb = self.buffer
+        out = self.np.buf
+        offsets = self._offsets
+        lut_r = self._lut_r
+        lut_g = self._lut_g
+        lut_b = self._lut_b
+        order = self.np.ORDER
+        ro = order[0]
+        go = order[1]
+        bo = order[2]
+        for i in range(len(offsets)):
+            v = fb[2 * i] | (fb[2 * i + 1] << 8)
+            o = offsets[i]
+            out[o + ro] = lut_r[v >> 11]
+            out[o + go] = lut_g[(v >> 5) & 0x3f]
+            out[o + bo] = lut_b[v & 0x1f]
+
+    def show(self):
+        """Commit the frame to the LEDs"""
+        self._convert()
+        self.np.write()
@@ -0,0 +1,180 @@
+"""
+scheduler.py
+
+Fixed-rate scheduler for periodic tasks.
+
+Tasks are run at fixed deadlines (start + n * period, measured with
+time.ticks_us()), so the time spent inside a task, on I2C reads or in
+np.write(), does not make the period drift. For every task execution
+time, lateness and missed deadlines are recorded, so it is easy to see
+which task eats the time budget.
+
+When the loop is overloaded, a task never runs several times in a row
+to catch up: missed periods are counted and the task continues with
+its next future deadline. Tasks added with max_late_ms are shed
+(skipped for this period) if they are more than that late when their
+turn comes; tasks without it always run.
+
+Example:
+    from scheduler import Scheduler
+    sched = Scheduler()
+    sched.add(read_imu, 10, name="imu", priority=1)
+    sched.add(update_display, 100, name="display", max_late_ms=20)
+    sched.run()
+"""
+
+import time
+
+
+class Task:
+    """A periodic task and its timing statistics. Times are in µs."""
+
+    def __init__(self, func, period_ms, name=None, priority=0, max_late_ms=None):
+        self.func = func
+        self.period_us = int(period_ms * 1000)
+        self.name = name or getattr(func, "__name__", "task")
+        self.priority = priority
+        self.max_late_us = None if max_late_ms is None else int(max_late_ms * 1000)
+        self.deadline = time.ticks_us()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.runs = 0           # number of executions
+        self.missed = 0         # number of deadlines passed without a run
+        self.shed = 0           # number of runs skipped because of overload
+        self.exec_us = 0        # duration of last run
+        self.exec_max_us = 0
+        self.exec_total_us = 0
+        self.late_us = 0        # lateness of last run
+        self.late_max_us = 0
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "period_us": self.period_us,
+            "runs": self.runs,
+            "missed": self.missed,
+            "shed": self.shed,
+            "exec_us": self.exec_us,
+            "exec_max_us": self.exec_max_us,
+            "exec_avg_us": self.exec_total_us // self.runs if self.runs else 0,
+            "late_us": self.late_us,
+            "late_max_us": self.late_max_us,
+        }
+
+
+class Scheduler:
+    """Runs registered tasks at fixed deadlines."""
+
+    def __init__(self):
+        self.tasks = []
+        self._running = False
+        self.busy_us = 0
+        self.idle_us = 0
+
+    def add(self, func, period_ms, name=None, priority=0, max_late_ms=None):
+        """Register func() to be called every period_ms milliseconds.
+
+        When several tasks are due, higher priority runs first.
+        Returns the Task, which holds the statistics.
+        """
+        task = Task(func, period_ms, name, priority, max_late_ms)
+        self.tasks.append(task)
+        self.tasks.sort(key=lambda t: t.priority, reverse=True)
+        return task
+
+    def remove(self, task):
+        self.tasks.remove(task)
+
+    def start(self):
+        """(Re)align all deadlines to now"""
+        now = time.ticks_us()
+        for task in self.tasks:
+            task.deadline = now
+
+    def run_once(self):
+        """Run all due tasks once.
+
+        Returns the time in µs until the next deadline (<= 0 if a task is
+        already due again).
+        """
+        for task in self.tasks:
+            now = time.ticks_us()
+            late = time.ticks_diff(now, task.deadline)
+            if late < 0:
+                continue
+
+            if late >= task.period_us:
+                # do not try to catch up, continue with the next deadline
+                missed = late // task.period_us
+                task.missed += missed
+                task.deadline = time.ticks_add(task.deadline, missed * task.period_us)
+                late -= missed * task.period_us
+            task.deadline = time.ticks_add(task.deadline, task.period_us)
+
+            if task.max_late_us is not None and late > task.max_late_us:
+                task.shed += 1
+                continue
+
+            task.func()
+            end = time.ticks_us()
+            exec_us = time.ticks_diff(end, now)
+            task.runs += 1
+            task.exec_us = exec_us
+            task.exec_total_us += exec_us
+            if exec_us > task.exec_max_us:
+                task.exec_max_us = exec_us
+            task.late_us = late
+            if late > task.late_max_us:
+                task.late_max_us = late
+            self.busy_us += exec_us
+
+        return self.time_to_next()
+
+    def time_to_next(self):
+        """Return µs until the next task is due"""
+        if not self.tasks:
+            return 0
+        now = time.ticks_us()
+        return min(time.ticks_diff(t.deadline, now) for t in self.tasks)
+
+    def run(self, duration_ms=None):
+        """Run tasks until stop() is called or duration_ms elapsed."""
+        self._running = True
+        self.start()
+        start = time.ticks_ms()
+        while self._running:
+            wait = self.run_once()
+            if duration_ms is not None and time.ticks_diff(time.ticks_ms(), start) >= duration_ms:
+                break
+            if wait > 0:
+                self.idle_us += wait
+                time.sleep_us(wait)
+        self._running = False
+
+    def stop(self):
+        self._running = False
+
+    def stats(self):
+        """Return a list with the statistics of all tasks"""
+        return [task.stats() for task in self.tasks]
+
+    def load(self):
+        """Return the fraction of time spent in tasks"""
+        total = self.busy_us + self.idle_us
+        return self.busy_us / total if total else 0.0
+
+    def reset_stats(self):
+        self.busy_us = 0
+        self.idle_us = 0
+        for task in self.tasks:
+            task.reset_stats()
+
+    def print_stats(self):
+        print("{:12} {:>8} {:>6} {:>6} {:>6} {:>8} {:>8} {:>8}".format(
+            "task", "period", "runs", "missed", "shed", "exec", "exec_max", "late_max"))
+        for s in self.stats():
+            print("{:12} {:>8} {:>6} {:>6} {:>6} {:>8} {:>8} {:>8}".format(
+                s["name"], s["period_us"], s["runs"], s["missed"], s["shed"],
+                s["exec_avg_us"], s["exec_max_us"], s["late_max_us"]))
+        print("load: {:.1f}%".format(100 * self.load()))
@@ -0,0 +1,231 @@
+"""
+wifi_connect.py
+
+Non-blocking connection manager for the WiFi station interface.
+
+begin() starts a connection attempt and returns immediately, poll()
+follows the wlan.status() transitions until the attempt succeeds, fails
+or times out. Networks that failed recently are put on an exponential
+backoff, so no radio time is wasted on them over and over. The backoff
+state can be saved with save_backoff() and restored after deep sleep
+with restore_backoff().
+
+For every attempt the time to associate, the time to get an IP address,
+the number of retries and the last RSSI are recorded (see stats()).
+
+Example:
+    import network
+    from wifi_connect import ConnectionManager
+    conn = ConnectionManager(network.WLAN(network.STA_IF))
+    conn.connect('ssid', 'password')
+    print(conn.stats())
+"""
+
+import network
+import struct
+import time
+
+IDLE = 'idle'
+CONNECTING = 'connecting'
+ASSOCIATED = 'associated'
+CONNECTED = 'connected'
+FAILED = 'failed'
+
+# status codes that end a connection attempt without success
+CONNECT_FAILED = tuple(getattr(network, name) for name in (
+    'STAT_WRONG_PASSWORD', 'STAT_NO_AP_FOUND', 'STAT_CONNECT_FAIL',
+    'STAT_ASSOC_FAIL', 'STAT_HANDSHAKE_TIMEOUT', 'STAT_BEACON_TIMEOUT')
+    if hasattr(network, name))
+
+STAT_GOT_IP = getattr(network, 'STAT_GOT_IP', None)
+
+# number of status transitions kept for the current attempt
+MAX_TRANSITIONS = 8
+
+
+class ConnectionManager:
+    """Connection state machine with per network backoff and metrics."""
+
+    def __init__(self, wlan, timeout_ms=10000, backoff_ms=5000, max_backoff_ms=300000):
+        self.wlan = wlan
+        self.timeout_ms = timeout_ms
+        self.backoff_ms = backoff_ms
+        self.max_backoff_ms = max_backoff_ms
+        self.state = IDLE
+        self.ssid = None
+        self.bssid = None
+        self.channel = None
+        # ssid -> [failures in a row, ticks_ms when the next attempt is allowed]
+        self.failures = {}
+        self.attempts = 0
+        self.successes = 0
+        self._start = 0
+        self._last_status = None
+        self._reset_attempt()
+
+    def _reset_attempt(self):
+        self.t_assoc_ms = None      # begin() -> associated with an AP
+        self.t_ip_ms = None         # begin() -> got an IP address
+        self.retries = 0            # failed attempts for this ssid before this one
+        self.rssi = None
+        self.transitions = []       # (ms since begin(), status)
+
+    def backoff_remaining(self, ssid):
+        """Return ms until ssid may be tried again, 0 if it may be tried now"""
+        entry = self.failures.get(ssid)
+        if entry is None:
+            return 0
+        return max(0, time.ticks_diff(entry[1], time.ticks_ms()))
+
+    def can_try(self, ssid):
+        return self.backoff_remaining(ssid) == 0
+
+    def save_backoff(self):
+        """Return the failures as bytes for restore_backoff().
+
+        Deadlines are stored as time.time() seconds: the RTC keeps
+        counting through deep sleep, ticks_ms() starts over.
+        """
+        now = int(time.time())
+        data = bytearray()
+        for ssid, (count, _) in self.failures.items():
+            name = ssid.encode('utf-8')
+            remaining = (self.backoff_remaining(ssid) + 999) // 1000
+            data.append(len(name))
+            data.extend(name)
+            data.extend(struct.pack('<BI', min(count, 255), now + remaining))
+        return data
+
+    def restore_backoff(self, data):
+        """Restore failures from save_backoff() data. Returns the number restored"""
+        now = int(time.time())
+        pos = 0
+        restored = 0
+        while pos < len(data):
+            n = data[pos]
+            if pos + 6 + n > len(data):
+                break
+            try:
+                ssid = bytes(data[pos + 1:pos + 1 + n]).decode('utf-8')
+            except UnicodeError:
+                break
+            count, retry_at = struct.unpack_from('<BI', data, pos + 1 + n)
+            pos += 6 + n
+            delay = min(max(0, retry_at - now) * 1000, self.max_backoff_ms)
+            self.failures[ssid] = [count, time.ticks_add(time.ticks_ms(), delay)]
+            restored += 1
+        return restored
+
+    def _fail(self):
+        entry = self.failures.get(self.ssid)
+        count = entry[0] + 1 if entry else 1
+        delay = min(self.backoff_ms << (count - 1), self.max_backoff_ms)
+        self.failures[self.ssid] = [count, time.ticks_add(time.ticks_ms(), delay)]
+        self.state = FAILED
+        try:
+            self.wlan.disconnect()
+        except OSError:
+            pass
+
+    def begin(self, ssid, password, bssid=None, channel=None, force=False):
+        """Start connecting to ssid. Returns False if ssid is backing off."""
+        if not force and not self.can_try(ssid):
+            return False
+
+        entry = self.failures.get(ssid)
+        self._reset_attempt()
+        self.retries = entry[0] if entry else 0
+        self.ssid = ssid
+        self.bssid = bssid
+        self.channel = channel
+        self.attempts += 1
+        self._last_status = None
+
+        self.wlan.active(True)
+        if bssid:
+            self.wlan.connect(ssid, password, bssid=bssid)
+        else:
+            self.wlan.connect(ssid, password)
+        self._start = time.ticks_ms()
+        self.state = CONNECTING
+        return True
+
+    def _read_rssi(self):
+        # on the ESP32 this raises as long as the station is not associated
+        try:
+            return self.wlan.status('rssi')
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def poll(self):
+        """Advance the current attempt. Returns the state"""
+        if self.state not in (CONNECTING, ASSOCIATED):
+            return self.state
+
+        elapsed = time.ticks_diff(time.ticks_ms(), self._start)
+        status = self.wlan.status()
+        if status != self._last_status:
+            self._last_status = status
+            if len(self.transitions) < MAX_TRANSITIONS:
+                self.transitions.append((elapsed, status))
+
+        rssi = self._read_rssi()
+        if rssi is not None:
+            self.rssi = rssi
+            if self.t_assoc_ms is None:
+                self.t_assoc_ms = elapsed
+                self.state = ASSOCIATED
+
+        if self.wlan.isconnected() or (status is not None and status == STAT_GOT_IP):
+            if self.t_assoc_ms is None:
+                self.t_assoc_ms = elapsed
+            self.t_ip_ms = elapsed
+            self.state = CONNECTED
+            self.successes += 1
+            self.failures.pop(self.ssid, None)
+        elif status in CONNECT_FAILED or elapsed > self.timeout_ms:
+            self._fail()
+
+        return self.state
+
+    def done(self):
+        return self.state in (IDLE, CONNECTED, FAILED)
+
+    def connect(self, ssid, password, bssid=None, channel=None, force=False, poll_ms=50):
+        """Blocking connect.
+
+        Returns True on success, False if the attempt failed and None if
+        it was skipped because ssid is backing off.
+        """
+        if not self.begin(ssid, password, bssid, channel, force):
+            return None
+        while not self.done():
+            time.sleep_ms(poll_ms)
+            self.poll()
+        return self.state == CONNECTED
+
+    async def connect_async(self, ssid, password, bssid=None, channel=None, force=False, poll_ms=50):
+        """asyncio version of connect()"""
+        import uasyncio as asyncio
+
+        if not self.begin(ssid, password, bssid, channel, force):
+            return None
+        while not self.done():
+            await asyncio.sleep_ms(poll_ms)
+            self.poll()
+        return self.state == CONNECTED
+
+    def stats(self):
+        """Return metrics of the last attempt and totals"""
+        return {
+            'state': self.state,
+            'ssid': self.ssid,
+            't_assoc_ms': self.t_assoc_ms,
+            't_ip_ms': self.t_ip_ms,
+            'retries': self.retries,
+            'rssi': self.rssi,
+            'transitions': self.transitions,
+            'attempts': self.attempts,
+            'successes': self.successes,
+            'backoff': dict((ssid, self.backoff_remaining(ssid)) for ssid in self.failures),
+        }
@@ -1,19 +1,55 @@
+import machine
 import network
 import socket
-import ure
 import time
 
+import httpd
+from wifi_connect import ConnectionManager, CONNECT_FAILED
+from wifi_profiles import ProfileStore
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    asyncio = None
+
 ap_ssid = "WifiManager"
 ap_password = "mysecret"
 ap_authmode = 3  # WPA2
 
+PROFILE_STORE = 'wifi.bin'
+# old text format profile file, imported once into PROFILE_STORE
 NETWORK_PROFILES = 'wifi.dat'
 
+# request line and headers, and the body, must each fit into this; the
+# headers of mobile browsers alone are around 900 bytes
+MAX_REQUEST_SIZE = 1536
+
+# static files (optionally stored gzip compressed as <name>.gz) served by the portal
+STATIC_DIR = 'www/'
+CONTENT_TYPES = {'html': 'text/html', 'css': 'text/css', 'js': 'application/javascript',
+                 'ico': 'image/x-icon', 'png': 'image/png', 'svg': 'image/svg+xml'}
+
+# last successful connection and connection backoff, kept in RTC memory
+# across deep sleep
+LAST_CONNECTION_MAGIC = b'WL2'
+
+AUTHMODE = {0: "open", 1: "WEP", 2: "WPA-PSK", 3: "WPA2-PSK", 4: "WPA/WPA2-PSK"}
+
+# scan results are reused for this long (ms)
+SCAN_TTL_MS = 30000
+
 wlan_ap = network.WLAN(network.AP_IF)
 wlan_sta = network.WLAN(network.STA_IF)
 
+conn = ConnectionManager(wlan_sta)
+
+profiles = ProfileStore(PROFILE_STORE, legacy=NETWORK_PROFILES)
+
 server_socket = None
 
+scan_results = None
+scan_time = 0
+
 
 def get_connection():
     """return a working WLAN(STA_IF) instance or None"""
@@ -22,181 +58,420 @@ def get_connection():
     if wlan_sta.isconnected():
         return wlan_sta
 
+    connected = connect_known()
+
+    # start web server for connection manager:
+    if not connected:
+        connected = start()
+
+    return wlan_sta if connected else None
+
+
+async def get_connection_async():
+    """asyncio version of get_connection().
+
+    The portal runs as a server task, so other tasks keep running while
+    it is up.
+    """
+
+    httpd.require_asyncio()
+    if wlan_sta.isconnected():
+        return wlan_sta
+
+    connected = await connect_known_async()
+    if not connected:
+        connected = await start_async()
+
+    return wlan_sta if connected else None
+
+
+def _last_network():
+    """Return (ssid, bssid, channel) to try first without scanning, or None"""
+    last = load_last_connection()
+    if last is None:
+        # RTC memory is lost on power up, use the stored profiles
+        recent = profiles.most_recent()
+        if recent is not None:
+            last = recent.ssid, recent.bssid, recent.channel
+    return last
+
+
+def _candidates(networks, last):
+    """Yield (ssid, password, bssid, channel, force) for the networks worth trying"""
+    for ssid, bssid, channel, rssi, authmode, hidden in order_networks(networks):
+        encrypted = authmode > 0
+        print("ssid: %s chan: %d rssi: %d authmode: %s" % (ssid, channel, rssi, AUTHMODE.get(authmode, '?')))
+        # the fast path may only have failed because of a stale BSSID
+        retry = last is not None and ssid == last[0] and bssid != last[1]
+        if encrypted:
+            if ssid in profiles:
+                yield ssid, profiles.password(ssid), bssid, channel, retry
+            else:
+                print("skipping unknown encrypted network")
+        else:  # open
+            yield ssid, None, bssid, channel, retry
+
+
+def connect_known():
+    """Try to connect to known or open networks in range. Returns True on success"""
+
     connected = False
     try:
-        # ESP connecting to WiFi takes time, wait a bit and try again:
-        time.sleep(3)
+        # ESP may still be reconnecting on its own, wait for it to finish:
+        if wlan_sta.status() == getattr(network, 'STAT_CONNECTING', None):
+            wait_connected(3000)
         if wlan_sta.isconnected():
-            return wlan_sta
-
-        # Read known network profiles from file
-        profiles = read_profiles()
-
-        # Search WiFis in range
-        wlan_sta.active(True)
-        networks = wlan_sta.scan()
-
-        AUTHMODE = {0: "open", 1: "WEP", 2: "WPA-PSK", 3: "WPA2-PSK", 4: "WPA/WPA2-PSK"}
-        for ssid, bssid, channel, rssi, authmode, hidden in sorted(networks, key=lambda x: x[3], reverse=True):
-            ssid = ssid.decode('utf-8')
-            encrypted = authmode > 0
-            print("ssid: %s chan: %d rssi: %d authmode: %s" % (ssid, channel, rssi, AUTHMODE.get(authmode, '?')))
-            if encrypted:
-                if ssid in profiles:
-                    password = profiles[ssid]
-                    connected = do_connect(ssid, password)
-                else:
-                    print("skipping unknown encrypted network")
-            else:  # open
-                connected = do_connect(ssid, None)
+            return True
+
+        # Fast path: reconnect to the last network without scanning
+        last = _last_network()
+        if last is not None:
+            ssid, bssid, channel = last
+            if do_connect(ssid, profiles.password(ssid), bssid, channel):
+                return True
+
+        # Search WiFis in range; after a failed fast path the AP may have
+        # moved (new BSSID or channel), which a cached scan would not show
+        networks = scan(SCAN_TTL_MS if last is None else 0)
+        for ssid, password, bssid, channel, retry in _candidates(networks, last):
+            connected = do_connect(ssid, password, bssid, channel, retry)
             if connected:
                 break
 
     except OSError as e:
         print("exception", str(e))
 
-    # start web server for connection manager:
-    if not connected:
-        connected = start()
+    return connected
 
-    return wlan_sta if connected else None
 
+async def connect_known_async(poll_ms=50):
+    """asyncio version of connect_known().
 
-def read_profiles():
-    with open(NETWORK_PROFILES) as f:
-        lines = f.readlines()
-    profiles = {}
-    for line in lines:
-        ssid, password = line.strip("\n").split(";")
-        profiles[ssid] = password
-    return profiles
+    Connection attempts yield to other tasks. Only the scan itself
+    blocks; cached results are used if they are fresh and there was no
+    fast path attempt.
+    """
 
+    connected = False
+    try:
+        if wlan_sta.status() == getattr(network, 'STAT_CONNECTING', None):
+            await wait_connected_async(3000, poll_ms)
+        if wlan_sta.isconnected():
+            return True
 
-def write_profiles(profiles):
-    lines = []
-    for ssid, password in profiles.items():
-        lines.append("%s;%s\n" % (ssid, password))
-    with open(NETWORK_PROFILES, "w") as f:
-        f.write(''.join(lines))
+        last = _last_network()
+        if last is not None:
+            ssid, bssid, channel = last
+            if await do_connect_async(ssid, profiles.password(ssid), bssid, channel):
+                return True
 
+        await asyncio.sleep_ms(0)
+        networks = scan(SCAN_TTL_MS if last is None else 0)
+        for ssid, password, bssid, channel, retry in _candidates(networks, last):
+            connected = await do_connect_async(ssid, password, bssid, channel, retry)
+            if connected:
+                break
+            await asyncio.sleep_ms(0)
+
+    except OSError as e:
+        print("exception", str(e))
+
+    return connected
+
+
+def refresh_scan():
+    """Scan for networks and update the scan cache.
+
+    Only the strongest access point of every SSID is kept, the list is
+    sorted by RSSI, strongest first.
+    """
+    global scan_results, scan_time
 
-def do_connect(ssid, password):
     wlan_sta.active(True)
-    if wlan_sta.isconnected():
+    best = {}
+    for ssid, bssid, channel, rssi, authmode, hidden in wlan_sta.scan():
+        ssid = ssid.decode('utf-8')
+        if ssid and (ssid not in best or rssi > best[ssid][3]):
+            best[ssid] = (ssid, bssid, channel, rssi, authmode, hidden)
+    scan_results = sorted(best.values(), key=lambda x: x[3], reverse=True)
+    scan_time = time.ticks_ms()
+    return scan_results
+
+
+def scan_age():
+    """Return age of the cached scan results in ms or None if there are none"""
+    if scan_results is None:
         return None
-    print('Trying to connect to %s...' % ssid)
-    wlan_sta.connect(ssid, password)
-    for retry in range(100):
-        connected = wlan_sta.isconnected()
-        if connected:
+    return time.ticks_diff(time.ticks_ms(), scan_time)
+
+
+def scan(max_age_ms=SCAN_TTL_MS):
+    """Return networks in range as (ssid, bssid, channel, rssi, authmode, hidden).
+
+    Cached results younger than max_age_ms are returned without
+    scanning. With max_age_ms=None any cached result is accepted.
+    """
+    age = scan_age()
+    if age is None or (max_age_ms is not None and age > max_age_ms):
+        return refresh_scan()
+    return scan_results
+
+
+def order_networks(networks):
+    """Sort scan results: known networks by priority and last success, then RSSI"""
+
+    def rank(net):
+        p = profiles.get(net[0])
+        if p is None:
+            return (1, 0, 0, -net[3])
+        return (0, -p.priority, -p.last_success, -net[3])
+
+    return sorted(networks, key=rank)
+
+
+def read_profiles():
+    """Return known networks as dict ssid -> password"""
+    return dict((p.ssid, p.password) for p in profiles.ordered())
+
+
+def write_profiles(passwords):
+    """Add or update known networks from a dict ssid -> password"""
+    for ssid, password in passwords.items():
+        profiles.set(ssid, password)
+
+
+def _read_rtc():
+    """Return (last connection or None, backoff data) from RTC memory.
+
+    Record: magic, len:u8 ssid channel:u8 bssid[6] (zeros if unknown),
+    then ConnectionManager.save_backoff() data.
+    """
+    try:
+        data = machine.RTC().memory()
+    except (AttributeError, OSError):
+        return None, b''
+    n = len(LAST_CONNECTION_MAGIC)
+    if len(data) < n + 8 or data[:n] != LAST_CONNECTION_MAGIC:
+        return None, b''
+    length = data[n]
+    end = n + 8 + length
+    # the record may be truncated or not ours
+    if len(data) < end:
+        return None, b''
+    last = None
+    if length:
+        try:
+            ssid = bytes(data[n + 1:n + 1 + length]).decode('utf-8')
+        except UnicodeError:
+            return None, b''
+        channel = data[n + 1 + length] or None
+        bssid = bytes(data[n + 2 + length:end])
+        last = ssid, bssid if any(bssid) else None, channel
+    return last, data[end:]
+
+
+def _write_rtc(last):
+    data = bytearray(LAST_CONNECTION_MAGIC)
+    if last is None:
+        data.extend(bytes(8))
+    else:
+        ssid, bssid, channel = last
+        ssid = ssid.encode('utf-8')
+        data.append(len(ssid))
+        data.extend(ssid)
+        data.append(channel or 0)
+        data.extend((bytes(bssid or b'') + bytes(6))[:6])
+    data.extend(conn.save_backoff())
+    try:
+        machine.RTC().memory(data)
+    except (AttributeError, OSError):
+        pass
+
+
+def save_last_connection(ssid, bssid=None, channel=None):
+    """Remember the last successful connection in RTC memory"""
+    _write_rtc((ssid, bssid, channel))
+
+
+def load_last_connection():
+    """Return (ssid, bssid, channel) of the last successful connection or None"""
+    return _read_rtc()[0]
+
+
+def clear_last_connection():
+    _write_rtc(None)
+
+
+def save_backoff():
+    """Keep the connection backoff in RTC memory, so it survives deep sleep"""
+    _write_rtc(load_last_connection())
+
+
+# networks that failed before deep sleep stay on backoff after waking up
+conn.restore_backoff(_read_rtc()[1])
+
+
+def wait_connected(timeout_ms=10000, poll_ms=50):
+    """Poll the station status until connected, failed or timed out"""
+    start = time.ticks_ms()
+    while time.ticks_diff(time.ticks_ms(), start) < timeout_ms:
+        if wlan_sta.isconnected():
+            return True
+        if wlan_sta.status() in CONNECT_FAILED:
             break
-        time.sleep(0.1)
-        print('.', end='')
+        time.sleep_ms(poll_ms)
+    return wlan_sta.isconnected()
+
+
+async def wait_connected_async(timeout_ms=10000, poll_ms=50):
+    """asyncio version of wait_connected()"""
+    start = time.ticks_ms()
+    while time.ticks_diff(time.ticks_ms(), start) < timeout_ms:
+        if wlan_sta.isconnected():
+            return True
+        if wlan_sta.status() in CONNECT_FAILED:
+            break
+        await asyncio.sleep_ms(poll_ms)
+    return wlan_sta.isconnected()
+
+
+def _connect_result(ssid, bssid, channel, connected):
     if connected:
-        print('\nConnected. Network config: ', wlan_sta.ifconfig())
+        print('Connected after {} ms. Network config: {}'.format(conn.t_ip_ms, wlan_sta.ifconfig()))
+        save_last_connection(ssid, bssid, channel)
+        profiles.record_success(ssid, bssid, channel)
+    elif connected is None:
+        print('Skipping %s, retry in %d ms' % (ssid, conn.backoff_remaining(ssid)))
+        return False
     else:
-        print('\nFailed. Not Connected to: ' + ssid)
+        print('Failed. Not Connected to: ' + ssid)
+        save_backoff()
     return connected
 
 
-def send_header(client, status_code=200, content_length=None ):
-    client.sendall("HTTP/1.0 {} OK\r\n".format(status_code))
-    client.sendall("Content-Type: text/html\r\n")
-    if content_length is not None:
-      client.sendall("Content-Length: {}\r\n".format(content_length))
-    client.sendall("\r\n")
+def do_connect(ssid, password, bssid=None, channel=None, force=False):
+    """Connect to ssid unless it failed recently (or force is set)"""
+    wlan_sta.active(True)
+    if wlan_sta.isconnected():
+        return None
+    print('Trying to connect to %s...' % ssid)
+    connected = conn.connect(ssid, password, bssid, channel, force)
+    return _connect_result(ssid, bssid, channel, connected)
+
+
+async def do_connect_async(ssid, password, bssid=None, channel=None, force=False):
+    """asyncio version of do_connect()"""
+    wlan_sta.active(True)
+    if wlan_sta.isconnected():
+        return None
+    print('Trying to connect to %s...' % ssid)
+    connected = await conn.connect_async(ssid, password, bssid, channel, force)
+    return _connect_result(ssid, bssid, channel, connected)
+
+
+def connection_stats():
+    """Return metrics of the last connection attempt, see ConnectionManager.stats()"""
+    return conn.stats()
+
+
+ROOT_HEAD = b"""\
+<html>
+<h1 style="color: #5e9ca0; text-align: center;">
+<span style="color: #ff0000;">Wi-Fi Client Setup</span>
+</h1>
+<form action="configure" method="post">
+<table style="margin-left: auto; margin-right: auto;">
+<tbody>
+"""
+
+ROOT_ROW = """\
+<tr><td colspan="2"><input type="radio" name="ssid" value="{0}" />{0} ({1} dBm, {2})</td></tr>
+"""
+
+ROOT_TAIL = ("""\
+<tr>
+<td>Password:</td>
+<td><input name="password" type="password" /></td>
+</tr>
+</tbody>
+</table>
+<p style="text-align: center;"><input type="submit" value="Submit" /></p>
+</form>
+<p>&nbsp;</p>
+<hr />
+<h5>
+<span style="color: #ff0000;">
+Your ssid and password information will be saved into the
+"%(filename)s" file in your ESP module for future usage.
+Be careful about security!
+</span>
+</h5>
+<hr />
+<h2 style="color: #2e6c80;">Some useful infos:</h2>
+<ul>
+<li>
+Original code from <a href="https://github.com/cpopp/MicroPythonSamples"
+target="_blank" rel="noopener">cpopp/MicroPythonSamples</a>.
+</li>
+<li>
+This code available at <a href="https://github.com/tayfunulu/WiFiManager"
+target="_blank" rel="noopener">tayfunulu/WiFiManager</a>.
+</li>
+</ul>
+</html>
+""" % dict(filename=PROFILE_STORE)).encode()
+
+_response = None
+
+
+def get_response():
+    """Return the shared, reusable response buffer"""
+    global _response
+
+    if _response is None:
+        _response = httpd.Response(3072)
+    _response.begin()
+    return _response
 
 
 def send_response(client, payload, status_code=200):
-    content_length = len(payload)
-    send_header(client, status_code, content_length)
-    if content_length > 0:
-        client.sendall(payload)
+    resp = get_response()
+    resp.write(payload)
+    resp.send(client, status_code)
     client.close()
 
 
 def handle_root(client):
-    wlan_sta.active(True)
-    ssids = sorted(ssid.decode('utf-8') for ssid, *_ in wlan_sta.scan())
-    send_header(client)
-    client.sendall("""\
-        <html>
-            <h1 style="color: #5e9ca0; text-align: center;">
-                <span style="color: #ff0000;">
-                    Wi-Fi Client Setup
-                </span>
-            </h1>
-            <form action="configure" method="post">
-                <table style="margin-left: auto; margin-right: auto;">
-                    <tbody>
-    """)
-    while len(ssids):
-        ssid = ssids.pop(0)
-        client.sendall("""\
-                        <tr>
-                            <td colspan="2">
-                                <input type="radio" name="ssid" value="{0}" />{0}
-                            </td>
-                        </tr>
-        """.format(ssid))
-    client.sendall("""\
-                        <tr>
-                            <td>Password:</td>
-                            <td><input name="password" type="password" /></td>
-                        </tr>
-                    </tbody>
-                </table>
-                <p style="text-align: center;">
-                    <input type="submit" value="Submit" />
-                </p>
-            </form>
-            <p>&nbsp;</p>
-            <hr />
-            <h5>
-                <span style="color: #ff0000;">
-                    Your ssid and password information will be saved into the
-                    "%(filename)s" file in your ESP module for future usage.
-                    Be careful about security!
-                </span>
-            </h5>
-            <hr />
-            <h2 style="color: #2e6c80;">
-                Some useful infos:
-            </h2>
-            <ul>
-                <li>
-                    Original code from <a href="https://github.com/cpopp/MicroPythonSamples"
-                        target="_blank" rel="noopener">cpopp/MicroPythonSamples</a>.
-                </li>
-                <li>
-                    This code available at <a href="https://github.com/tayfunulu/WiFiManager"
-                        target="_blank" rel="noopener">tayfunulu/WiFiManager</a>.
-                </li>
-            </ul>
-        </html>
-    """ % dict(filename=NETWORK_PROFILES))
+    # a stale cache is refreshed on demand, the scan blocks for its duration
+    try:
+        networks = scan()
+    except OSError as e:
+        print("scan failed", str(e))
+        networks = scan_results or []
+    resp = get_response()
+    resp.write(ROOT_HEAD)
+    for ssid, bssid, channel, rssi, authmode, hidden in networks:
+        resp.write(ROOT_ROW.format(httpd.escape(ssid), rssi, AUTHMODE.get(authmode, '?')))
+    resp.write(ROOT_TAIL)
+    resp.send(client)
     client.close()
 
 
-def handle_configure(client, request):
-    match = ure.search("ssid=([^&]*)&password=(.*)", request)
-
-    if match is None:
+def configure_params(client, request):
+    """Return (ssid, password) from the configure form, None after sending an error"""
+    form = request.form()
+    if "ssid" not in form or "password" not in form:
         send_response(client, "Parameters not found", status_code=400)
-        return False
-    # version 1.9 compatibility
-    try:
-        ssid = match.group(1).decode("utf-8").replace("%3F", "?").replace("%21", "!")
-        password = match.group(2).decode("utf-8").replace("%3F", "?").replace("%21", "!")
-    except Exception:
-        ssid = match.group(1).replace("%3F", "?").replace("%21", "!")
-        password = match.group(2).replace("%3F", "?").replace("%21", "!")
+        return None
 
-    if len(ssid) == 0:
+    if len(form["ssid"]) == 0:
         send_response(client, "SSID must be provided", status_code=400)
-        return False
+        return None
+    return form["ssid"], form["password"]
 
-    if do_connect(ssid, password):
+
+def configure_result(client, ssid, password, connected):
+    if connected:
         response = """\
             <html>
                 <center>
@@ -209,16 +484,13 @@ def handle_configure(client, request):
                     <br><br>
                 </center>
             </html>
-        """ % dict(ssid=ssid)
+        """ % dict(ssid=httpd.escape(ssid))
         send_response(client, response)
         try:
-            profiles = read_profiles()
-        except OSError:
-            profiles = {}
-        profiles[ssid] = password
-        write_profiles(profiles)
-
-        time.sleep(5)
+            profiles.set(ssid, password)
+            profiles.record_success(ssid, conn.bssid, conn.channel)
+        except (OSError, ValueError) as e:
+            print("could not save profile", str(e))
 
         return True
     else:
@@ -236,15 +508,83 @@ def handle_configure(client, request):
                     </form>
                 </center>
             </html>
-        """ % dict(ssid=ssid)
+        """ % dict(ssid=httpd.escape(ssid))
         send_response(client, response)
         return False
 
 
+def handle_configure(client, request):
+    params = configure_params(client, request)
+    if params is None:
+        return False
+    ssid, password = params
+    # the user just entered the password, ignore any backoff
+    return configure_result(client, ssid, password, do_connect(ssid, password, force=True))
+
+
+async def handle_configure_async(client, request):
+    params = configure_params(client, request)
+    if params is None:
+        return False
+    ssid, password = params
+    connected = await do_connect_async(ssid, password, force=True)
+    return configure_result(client, ssid, password, connected)
+
+
+def handle_static(client, url):
+    """Serve url from STATIC_DIR. Returns False if there is no such file"""
+    if ".." in url:
+        return False
+    content_type = CONTENT_TYPES.get(url.rsplit(".", 1)[-1], "application/octet-stream")
+    if httpd.send_file(client, get_response(), STATIC_DIR + url, content_type):
+        client.close()
+        return True
+    return False
+
+
 def handle_not_found(client, url):
     send_response(client, "Path not found: {}".format(url), status_code=404)
 
 
+def handle_request(client, request):
+    """Dispatch a parsed httpd.Request. Returns the url"""
+
+    url = request.path.strip("/")
+    print("{} {}".format(request.method, url))
+
+    if url == "":
+        handle_root(client)
+    elif url == "configure":
+        handle_configure(client, request)
+    elif handle_static(client, url):
+        pass
+    elif url == "favicon.ico":
+        # answer without a body, browsers ask for it on every page load
+        get_response().send(client, 204)
+        client.close()
+    else:
+        handle_not_found(client, url)
+    return url
+
+
+def handle_error(client, error):
+    send_response(client, str(error), status_code=error.status)
+
+
+_parsers = []
+
+
+def get_parser():
+    """Return a request parser from the pool"""
+    if _parsers:
+        return _parsers.pop()
+    return httpd.Request(MAX_REQUEST_SIZE)
+
+
+def put_parser(parser):
+    _parsers.append(parser)
+
+
 def stop():
     global server_socket
 
@@ -253,6 +593,16 @@ def stop():
         server_socket = None
 
 
+def start_ap():
+    wlan_sta.active(True)
+    wlan_ap.active(True)
+
+    wlan_ap.config(essid=ap_ssid, password=ap_password, authmode=ap_authmode)
+
+    print('Connect to WiFi ssid ' + ap_ssid + ', default password: ' + ap_password)
+    print('and access the ESP via your favorite web browser at 192.168.4.1.')
+
+
 def start(port=80):
     global server_socket
 
@@ -260,52 +610,86 @@ def start(port=80):
 
     stop()
 
-    wlan_sta.active(True)
-    wlan_ap.active(True)
-
-    wlan_ap.config(essid=ap_ssid, password=ap_password, authmode=ap_authmode)
+    start_ap()
 
     server_socket = socket.socket()
     server_socket.bind(addr)
     server_socket.listen(1)
 
-    print('Connect to WiFi ssid ' + ap_ssid + ', default password: ' + ap_password)
-    print('and access the ESP via your favorite web browser at 192.168.4.1.')
     print('Listening on:', addr)
 
+    scan(max_age_ms=None)
+
     while True:
         if wlan_sta.isconnected():
             return True
 
         client, addr = server_socket.accept()
         print('client connected from', addr)
+        parser = get_parser()
         try:
             client.settimeout(5.0)
-
-            request = b""
-            try:
-                while "\r\n\r\n" not in request:
-                    request += client.recv(512)
-            except OSError:
-                pass
-
-            print("Request is: {}".format(request))
-            if "HTTP" not in request:  # skip invalid requests
-                continue
-
-            # version 1.9 compatibility
-            try:
-                url = ure.search("(?:GET|POST) /(.*?)(?:\\?.*?)? HTTP", request).group(1).decode("utf-8").rstrip("/")
-            except Exception:
-                url = ure.search("(?:GET|POST) /(.*?)(?:\\?.*?)? HTTP", request).group(1).rstrip("/")
-            print("URL is {}".format(url))
-
-            if url == "":
-                handle_root(client)
-            elif url == "configure":
-                handle_configure(client, request)
-            else:
-                handle_not_found(client, url)
-
+            httpd.read_request(client, parser)
+            if handle_request(client, parser) == "configure" and wlan_sta.isconnected():
+                # give the browser time to fetch the result page
+                time.sleep(5)
+        except httpd.HTTPError as e:
+            handle_error(client, e)
+        except OSError as e:
+            print("client error", repr(e))
         finally:
+            put_parser(parser)
             client.close()
+
+        # refresh scan results between requests, never while a client waits
+        if scan_age() > SCAN_TTL_MS:
+            refresh_scan()
+
+
+async def serve_client(reader, writer, timeout=5):
+    """asyncio stream handler for the portal"""
+
+    parser = get_parser()
+    try:
+        await httpd.handle_stream(reader, writer, parser, handle_request_async, handle_error, timeout)
+    finally:
+        put_parser(parser)
+
+
+async def handle_request_async(client, request):
+    if request.path.strip("/") == "configure":
+        # connecting takes seconds, do not block the other tasks
+        await handle_configure_async(client, request)
+    else:
+        handle_request(client, request)
+
+
+async def start_async(port=80, poll_ms=100):
+    """asyncio version of start().
+
+    Serves several clients concurrently and runs alongside other tasks.
+    The server is shut down as soon as the station is connected.
+    Returns True once connected.
+
+    There is no background scan: wlan.scan() blocks the whole loop, so
+    the network list is only refreshed when / is requested and the
+    cached scan is older than SCAN_TTL_MS. Other tasks stall for the
+    length of that scan (up to a few seconds).
+    """
+
+    httpd.require_asyncio()
+    start_ap()
+
+    scan(max_age_ms=None)
+
+    server = await asyncio.start_server(serve_client, '0.0.0.0', port, backlog=4)
+    print('Listening on port', port)
+    try:
+        while not wlan_sta.isconnected():
+            await asyncio.sleep_ms(poll_ms)
+    finally:
+        server.close()
+        await server.wait_closed()
+
+    return True
+
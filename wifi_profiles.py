@@ -0,0 +1,214 @@
+"""
+wifi_profiles.py
+
+Store for known WiFi networks.
+
+Profiles are kept in a compact, length-prefixed binary file, so SSIDs and
+passwords may contain any character. Updates are written to a temporary
+file which then replaces the store with os.rename(), so a brown-out
+while saving leaves either the old or the new version, never a
+truncated one.
+
+Besides SSID and password every profile has the BSSID and channel of the
+last successful connection, a priority and last_success, a sequence
+number of successful connections: the network connected to most
+recently has the highest one. A counter rather than the time, as the
+RTC restarts at 2000-01-01 on power up unless it is set by NTP. These
+are used to order connection attempts.
+
+File format (little endian):
+    b'WPS' version:u8 count:u8
+    per profile:
+        len:u8 ssid  len:u8 password  len:u8 bssid
+        channel:u8 priority:u8 last_success:u32
+"""
+
+import os
+import struct
+
+MAGIC = b'WPS'
+VERSION = 1
+
+MAX_PROFILES = 8
+MAX_SSID = 32
+MAX_PASSWORD = 64
+
+
+class Profile:
+    """A known network"""
+
+    def __init__(self, ssid, password=None, bssid=None, channel=0, priority=0, last_success=0):
+        self.ssid = ssid
+        self.password = password
+        self.bssid = bssid
+        self.channel = channel
+        self.priority = priority
+        self.last_success = last_success
+
+    def __repr__(self):
+        return "Profile(%r, channel=%d, priority=%d, last_success=%d)" % (
+            self.ssid, self.channel, self.priority, self.last_success)
+
+
+class ProfileStore:
+    """Known networks, loaded once and cached.
+
+    filename: binary profile store
+    legacy:   old 'ssid;password' text file, imported if the store does
+              not exist yet
+    """
+
+    def __init__(self, filename='wifi.bin', legacy=None, max_profiles=MAX_PROFILES):
+        self.filename = filename
+        self.legacy = legacy
+        self.max_profiles = max_profiles
+        self._profiles = None
+        self.seq = 0    # highest last_success
+
+    @property
+    def profiles(self):
+        if self._profiles is None:
+            self.load()
+        return self._profiles
+
+    def load(self):
+        """(Re)read the store from flash"""
+        self._profiles = {}
+        self.seq = 0
+        try:
+            with open(self.filename, 'rb') as f:
+                data = f.read()
+        except OSError:
+            self._import_legacy()
+            return
+        try:
+            self._decode(data)
+        except (ValueError, IndexError) as e:
+            print("invalid profile store", self.filename, str(e))
+            self._profiles = {}
+        for p in self._profiles.values():
+            self.seq = max(self.seq, p.last_success)
+
+    def _decode(self, data):
+        if data[:3] != MAGIC or data[3] != VERSION:
+            raise ValueError("bad header")
+        count = data[4]
+        pos = 5
+        for _ in range(count):
+            fields = []
+            for _ in range(3):
+                n = data[pos]
+                fields.append(bytes(data[pos + 1:pos + 1 + n]))
+                pos += 1 + n
+            channel, priority, last_success = struct.unpack_from('<BBI', data, pos)
+            pos += 6
+            ssid = fields[0].decode('utf-8')
+            self._profiles[ssid] = Profile(
+                ssid, fields[1].decode('utf-8'), fields[2] or None, channel, priority, last_success)
+
+    def _import_legacy(self):
+        if self.legacy is None:
+            return
+        try:
+            with open(self.legacy) as f:
+                lines = f.readlines()
+        except OSError:
+            return
+        for line in lines:
+            line = line.strip("\n")
+            if ";" in line:
+                ssid, password = line.split(";", 1)
+                self._profiles[ssid] = Profile(ssid, password)
+        if self._profiles:
+            self._trim()
+            self.save()
+
+    def _encode(self):
+        data = bytearray(MAGIC)
+        data.append(VERSION)
+        data.append(len(self.profiles))
+        for p in self.profiles.values():
+            for field in (p.ssid.encode('utf-8'), (p.password or '').encode('utf-8'), p.bssid or b''):
+                data.append(len(field))
+                data.extend(field)
+            data.extend(struct.pack('<BBI', p.channel or 0, p.priority, p.last_success))
+        return data
+
+    def save(self):
+        """Write the store to a temporary file and rename it over the old one"""
+        tmp = self.filename + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(self._encode())
+        os.rename(tmp, self.filename)
+
+    def _trim(self, keep=None):
+        # drop lowest priority / least recently used profiles, never keep
+        while len(self._profiles) > self.max_profiles:
+            p = min((p for p in self._profiles.values() if p.ssid != keep),
+                    key=lambda p: (p.priority, p.last_success))
+            del self._profiles[p.ssid]
+
+    def __contains__(self, ssid):
+        return ssid in self.profiles
+
+    def __len__(self):
+        return len(self.profiles)
+
+    def get(self, ssid):
+        return self.profiles.get(ssid)
+
+    def password(self, ssid):
+        p = self.profiles.get(ssid)
+        return p.password if p else None
+
+    def ordered(self):
+        """Return profiles, most promising first"""
+        return sorted(self.profiles.values(),
+                      key=lambda p: (p.priority, p.last_success), reverse=True)
+
+    def set(self, ssid, password, priority=None):
+        """Add or update a profile and save the store"""
+        if len(ssid.encode('utf-8')) > MAX_SSID or len(password.encode('utf-8')) > MAX_PASSWORD:
+            raise ValueError("ssid or password too long")
+        p = self.profiles.get(ssid)
+        if p is None:
+            p = self.profiles[ssid] = Profile(ssid)
+        p.password = password
+        if priority is not None:
+            p.priority = priority
+        self._trim(ssid)
+        self.save()
+
+    def remove(self, ssid):
+        if self.profiles.pop(ssid, None) is not None:
+            self.save()
+
+    def record_success(self, ssid, bssid=None, channel=None):
+        """Remember a successful connection.
+
+        Only written to flash if BSSID or channel changed, or ssid was
+        not the most recent network yet.
+        """
+        p = self.profiles.get(ssid)
+        if p is None:
+            return
+        changed = (bssid is not None and bssid != p.bssid) or \
+                  (channel is not None and channel != p.channel)
+        if bssid is not None:
+            p.bssid = bytes(bssid)
+        if channel is not None:
+            p.channel = channel
+        if not p.last_success or p.last_success < self.seq:
+            self.seq += 1
+            p.last_success = self.seq
+            changed = True
+        if changed:
+            self.save()
+
+    def most_recent(self):
+        """Return the profile with the latest successful connection or None"""
+        best = None
+        for p in self.profiles.values():
+            if p.last_success and (best is None or p.last_success > best.last_success):
+                best = p
+        return best